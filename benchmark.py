@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""Benchmark parsing and report steps against their previous versions."""
+
+# Import libraries
+from common import Configuration, get_timestamp
+from qrecord import parse_qualification_record
+from qreminder import build_reminder_table
+from qreport import mark_refresher_training
+from bs4 import BeautifulSoup
+from io import StringIO
+import numpy as np
+import pandas as pd
+import glob
+import timeit
+
+
+# Function to parse qualification page as in previous version
+def parse_qualification_record_previous(page_source, staff_id):
+    """Parse qualification page with BeautifulSoup and row assignment."""
+    soup = BeautifulSoup(page_source, 'lxml')
+
+    # Find staff name, organisation unit and description
+    name_and_id = soup.find(
+        "span",
+        id="ctl00_cphContent_MtrcMaster_ctl02_dgrdStaff_ctl02_Label8")
+    name = name_and_id.text.lstrip().rstrip().replace(staff_id, "").rstrip()
+    unit = soup.find(
+        "span", id="ctl00_cphContent_MtrcMaster_ctl02_Label3").text
+    unit_desc = soup.find(
+        "span", id="ctl00_cphContent_MtrcMaster_ctl02_Label5").text
+
+    # Find data table
+    table = soup.find(
+        "table",
+        id="ctl00_cphContent_MtrcMaster_ctl02_dgrdStaff_ctl02_dgrdStaffQual")
+    entries = table.find_all("td")
+
+    # Initialise dataframe
+    df_record = pd.DataFrame(columns=[
+        "Qualification Code", "Qualification", "First Obtain",
+        "Last Refresh", "Expiry", "Due for Refresh/Examination",
+        "Last Practice/Attachment", "Status", "Note"])
+
+    # Iterate through all entries in the table
+    row = []
+    for i, e in enumerate(entries):
+        text = e.text.lstrip().rstrip()
+
+        # Handle qualification code and qualification
+        if i % 8 == 0:
+            if " " in text:
+                text_1 = text.split(" ")[0]
+                row.append(text_1)
+                row.append(text.replace(text_1, "").lstrip())
+            else:
+                row.append("")
+                row.append(text)
+
+        else:
+            row.append(text)
+
+        # Write row to dataframe
+        if i % 8 == 7:
+            df_record.loc[i // 8] = row
+            row.clear()
+
+    # Add organisation unit and description columns
+    df_record["Organization Unit"] = unit
+    df_record["Organization Unit Desc"] = unit_desc
+
+    return name, df_record
+
+
+# Function to benchmark qualification page parser
+def benchmark_qualification_parser(fixture_path="fixture", number=10):
+    """Benchmark qualification page parser against saved pages."""
+    # Load saved page sources named Q_<staff ID>.html
+    fixtures = []
+    for f in sorted(glob.glob(fixture_path + "/Q_*.html")):
+        with open(f, "r", encoding="utf-8") as file:
+            fixtures.append((f, f.replace('\\', '/').split('/')[-1][2:-5],
+                             file.read()))
+
+    for f, staff_id, page_source in fixtures:
+        # Check if both parsers give the same result
+        name, df_new = parse_qualification_record(page_source, staff_id)
+        name_p, df_previous = parse_qualification_record_previous(
+                page_source, staff_id)
+        assert name == name_p
+        pd.testing.assert_frame_equal(df_new, df_previous)
+
+        # Time both parsers
+        t_new = min(timeit.repeat(
+            lambda: parse_qualification_record(page_source, staff_id),
+            number=number, repeat=3)) / number
+        t_previous = min(timeit.repeat(
+            lambda: parse_qualification_record_previous(
+                page_source, staff_id),
+            number=number, repeat=3)) / number
+
+        print("[" + get_timestamp() + "] " + f + " (" +
+              str(len(df_new)) + " rows): previous " +
+              format(t_previous * 1000, ".2f") + " ms, current " +
+              format(t_new * 1000, ".2f") + " ms, " +
+              format(t_previous / t_new, ".1f") + "x faster.")
+
+
+# Function to mark refresher training as in previous version
+def mark_refresher_training_previous(config, df_reminder):
+    """Mark refresher training with loops over staff and codes."""
+    for s in df_reminder["Staff ID"].unique():
+        df_reminder_s = df_reminder[
+                df_reminder["Staff ID"] == s].convert_dtypes()
+
+        for t in config["has_refresher"]:
+            for q in t[0:-1]:
+                df_refresher = df_reminder_s[df_reminder_s[
+                    "Qualification Code"] == q]
+                if df_refresher.empty:
+                    continue
+
+                # Calculate if refresher training is required
+                df_refresher["Refresher"] = (pd.DatetimeIndex(
+                    df_refresher["Expiry_d"]).year - pd.DatetimeIndex(
+                        df_refresher["First Obtain_d"]).year) % t[-1]
+
+                # Update results to reminder dataframe
+                df_reminder.update(df_refresher)
+
+    # Indicate if refresher training is required
+    df_reminder["Refresher"] = df_reminder["Refresher"].astype("string")
+    df_reminder["Refresher"] = df_reminder["Refresher"].replace(np.nan, '-')
+    df_reminder["Refresher"] = df_reminder["Refresher"].replace("0.0", 'Y')
+    df_reminder["Refresher"] = df_reminder["Refresher"].replace(
+            r'\d+.\d+', 'N', regex=True)
+
+    return df_reminder
+
+
+# Function to build a reminder dataframe
+def build_reminder_frame(rows, seed=0):
+    """Build a reminder dataframe as given by report analysis."""
+    rng = np.random.default_rng(seed)
+    codes = np.array(["A1", "A2", "B1", "B2", "C1", "X", "Y"])
+
+    expiry = pd.Timestamp("2026-01-01") + pd.to_timedelta(
+            rng.integers(0, 365, rows), unit="D")
+    first_obtain = expiry - pd.to_timedelta(
+            rng.integers(365, 4000, rows), unit="D")
+    first_obtain = first_obtain.where(rng.random(rows) > 0.05)
+
+    return pd.DataFrame({
+        "Staff ID": 100000 + rng.integers(0, rows // 3, rows),
+        "Qualification Code": codes[rng.integers(0, len(codes), rows)],
+        "Expiry_d": expiry,
+        "First Obtain_d": first_obtain,
+        "Days Remaining": rng.integers(0, 90, rows),
+        "Refresher": np.nan})
+
+
+# Function to benchmark refresher training computation
+def benchmark_refresher_training(rows=12000):
+    """Benchmark refresher training computation on a large reminder."""
+    config = Configuration(
+            {"has_refresher": [["A1", "A2", 3], ["B1", 2], ["C1", "A1", 5]]})
+    df_reminder = build_reminder_frame(rows)
+
+    # Check if both versions give the same result
+    df_new = mark_refresher_training(config, df_reminder.copy())
+    df_previous = mark_refresher_training_previous(config, df_reminder.copy())
+    pd.testing.assert_series_equal(df_new["Refresher"],
+                                   df_previous["Refresher"])
+
+    # Time both versions
+    t_new = min(timeit.repeat(
+        lambda: mark_refresher_training(config, df_reminder.copy()),
+        number=1, repeat=3))
+    t_previous = min(timeit.repeat(
+        lambda: mark_refresher_training_previous(
+            config, df_reminder.copy()),
+        number=1, repeat=1))
+
+    print("[" + get_timestamp() + "] Refresher training (" + str(rows) +
+          " rows): previous " + format(t_previous * 1000, ".2f") +
+          " ms, current " + format(t_new * 1000, ".2f") + " ms, " +
+          format(t_previous / t_new, ".1f") + "x faster.")
+
+
+# Function to build reminder table as in previous version
+def build_reminder_table_previous(config, mode, df):
+    """Build reminder table with pandas Styler and string replacement."""
+    # Drop uneccessary columns
+    df.drop(["Staff ID", "Qualification Code", "Status", "Note",
+             "Organization Unit", "Organization Unit Desc", "Expiry_d",
+             "First Obtain_d", "Due for Refresh/Examination", "Last Refresh_d"
+             ], axis=1, inplace=True)
+
+    # Drop name for daily reminder
+    if mode == "daily":
+        df.drop("Name", axis=1, inplace=True)
+
+    # Change expiry date column to red in colour
+    df = df.style.set_properties(
+            **{"color": "red"}, subset=["Expiry"]).hide(
+                    axis='index')
+
+    # Convert dataframe to HTML table
+    email_table = df.to_html(
+            index=False, justify="center").replace(
+                    '<td', '<td align="center"').replace(
+                            '<table',
+                            '<table border="1" class="dataframe"' +
+                            'style="font-family: Courier New" cellpadding=24')
+
+    # Make remaining days red in colour
+    if mode == "daily":
+        for rdr in config["remaining_days_red"]:
+            email_table = email_table.replace(
+                    'col5" >' + str(rdr) + '<',
+                    'col5" style="color:red;">' + str(rdr) + '<')
+
+    # Make practice count red in colour
+    col_num = {"daily": '4', "quarterly": '5'}
+    for pr in config["practice_red"]:
+        email_table = email_table.replace(
+                'col' + col_num[mode] + '" >' + str(pr) + '<',
+                'col' + col_num[mode] + '" style="color:red;">' + str(
+                    pr) + '<')
+
+    return email_table
+
+
+# Function to build a reminder dataframe with practice records
+def build_practice_frame(rows, seed=0):
+    """Build a reminder dataframe as given by practice record fetching."""
+    rng = np.random.default_rng(seed)
+    df = build_reminder_frame(rows, seed)
+
+    return pd.DataFrame({
+        "Staff ID": df["Staff ID"],
+        "Name": "Staff " + df["Staff ID"].astype(str),
+        "Qualification Code": df["Qualification Code"],
+        "Qualification": "Qualification " + df["Qualification Code"],
+        "First Obtain": df["First Obtain_d"].dt.strftime("%d/%m/%Y"),
+        "Last Refresh": '-',
+        "Expiry": df["Expiry_d"].dt.strftime("%d/%m/%Y"),
+        "Due for Refresh/Examination": np.nan,
+        "Practice Done": rng.choice(["0", "1", "5", "?", '-'], rows),
+        "Status": "Valid",
+        "Note": '',
+        "Organization Unit": "ABC123",
+        "Organization Unit Desc": "Engineering Unit",
+        "Expiry_d": df["Expiry_d"],
+        "First Obtain_d": df["First Obtain_d"],
+        "Days Remaining": df["Days Remaining"],
+        "Refresher": rng.choice(['Y', 'N', '-'], rows),
+        "Last Refresh_d": df["First Obtain_d"]})
+
+
+# Function to benchmark reminder table rendering
+def benchmark_reminder_table(rows=20, number=100):
+    """Benchmark reminder table rendering of a daily reminder email."""
+    config = Configuration({"remaining_days_red": [0, 1, 7, 14, 30],
+                            "practice_red": [0, '?']})
+    df = build_practice_frame(rows)
+
+    # Check if both versions show the same table in red cells
+    table_new = build_reminder_table(config, "daily", df.copy())
+    table_previous = build_reminder_table_previous(
+            config, "daily", df.copy())
+    pd.testing.assert_frame_equal(pd.read_html(StringIO(table_new))[0],
+                                  pd.read_html(StringIO(table_previous))[0])
+    assert table_new.count("color:red") == \
+        table_previous.count("color:red") + len(df)
+
+    # Time both versions
+    t_new = min(timeit.repeat(
+        lambda: build_reminder_table(config, "daily", df.copy()),
+        number=number, repeat=3)) / number
+    t_previous = min(timeit.repeat(
+        lambda: build_reminder_table_previous(config, "daily", df.copy()),
+        number=number, repeat=3)) / number
+
+    print("[" + get_timestamp() + "] Reminder table (" + str(len(df)) +
+          " rows): previous " + format(t_previous * 1000, ".2f") +
+          " ms, current " + format(t_new * 1000, ".2f") + " ms, " +
+          format(t_previous / t_new, ".1f") + "x faster.")
+
+
+if __name__ == "__main__":
+    # Benchmark qualification page parser
+    benchmark_qualification_parser()
+
+    # Benchmark refresher training computation
+    benchmark_refresher_training()
+
+    # Benchmark reminder table rendering
+    benchmark_reminder_table()
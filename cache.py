@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Cache CQAS practice records across runs."""
+
+# Import libraries
+from common import get_timestamp, read_configuration_file
+from store import connect_record_store
+from datetime import datetime
+from metrics import increment
+import threading
+
+# Initialise cache hit and miss counts of this run
+cache_stats = {"hit": 0, "miss": 0}
+cache_stats_lock = threading.Lock()
+
+
+# Function to read practice counts from cache
+def read_practice_cache(config, keys):
+    """Read fresh practice counts of (staff ID, code, since) keys."""
+    now = datetime.now()
+
+    # Entries expire after TTL or at the end of the day they were fetched
+    expiry = max(now.timestamp() - config.get("practice_cache_ttl", 86400),
+                 now.replace(hour=0, minute=0, second=0,
+                             microsecond=0).timestamp())
+
+    counts = {}
+    connection = connect_record_store(config)
+    with connection:
+        for key in keys:
+            row = connection.execute(
+                    "SELECT count FROM practice WHERE staff_id = ? "
+                    "AND qualification_code = ? AND since = ? "
+                    "AND fetched_at >= ?", (*key, expiry)).fetchone()
+
+            # Record access time for eviction
+            if row is not None:
+                counts[key] = row[0]
+                connection.execute(
+                        "UPDATE practice SET accessed_at = ? "
+                        "WHERE staff_id = ? AND qualification_code = ? "
+                        "AND since = ?", (now.timestamp(), *key))
+    connection.close()
+
+    # Count cache hits and misses
+    with cache_stats_lock:
+        cache_stats["hit"] += len(counts)
+        cache_stats["miss"] += len(keys) - len(counts)
+    increment("tqm_practice_cache_total", len(counts), result="hit")
+    increment("tqm_practice_cache_total", len(keys) - len(counts),
+              result="miss")
+
+    return counts
+
+
+# Function to write practice counts to cache
+def write_practice_cache(config, counts):
+    """Write practice counts and evict least recently used entries."""
+    now = datetime.now().timestamp()
+
+    connection = connect_record_store(config)
+    with connection:
+        connection.executemany(
+                "INSERT OR REPLACE INTO practice "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(*key, count, now, now) for key, count in counts.items()])
+
+        # Keep cache within size limit
+        connection.execute(
+                "DELETE FROM practice WHERE rowid NOT IN ("
+                "SELECT rowid FROM practice "
+                "ORDER BY accessed_at DESC LIMIT ?)",
+                (config.get("practice_cache_size", 10000),))
+    connection.close()
+
+
+# Function to report cache hit and miss counts
+def report_practice_cache():
+    """Print and reset practice cache hit and miss counts of this run."""
+    with cache_stats_lock:
+        print("[" + get_timestamp() + "] Practice cache: " +
+              str(cache_stats["hit"]) + " hit(s), " +
+              str(cache_stats["miss"]) + " miss(es).")
+
+        cache_stats["hit"] = 0
+        cache_stats["miss"] = 0
+
+
+if __name__ == "__main__":
+    # Read configuration file
+    config = read_configuration_file()
+
+    # Count cached practice records
+    connection = connect_record_store(config)
+    print("[" + get_timestamp() + "] " + str(connection.execute(
+        "SELECT COUNT(*) FROM practice").fetchone()[0]) +
+        " practice record(s) in cache.")
+    connection.close()
@@ -2,10 +2,15 @@
 """Running some common functions."""
 
 # Import libraries
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+import pandas as pd
+import glob
 import logging
 import os
 import json
+import queue
+import threading
 
 
 # Funtion to get timestamp
@@ -42,26 +47,221 @@ def handle_error_message(error):
     logging.error("[" + get_timestamp() + "] " + str(error))
 
 
+# Keys required in configuration file and their types
+CONFIGURATION_KEYS = {
+    "staff_list_path": str,
+    "q_report_path": str,
+    "q_report_abs_path": str,
+    "t_report_path": str,
+    "t_report_abs_path": str,
+    "enquiry_qualification_link": str,
+    "enquiry_practice_link": str,
+    "enquiry_training_link": str,
+    "fetch_time": str,
+    "reminder_time": str,
+    "email_sender": dict,
+    "email_cc": list,
+    "email_cc_expiry": list,
+    "team_admin": dict,
+    "bypass_qualification": list,
+    "has_practice": list,
+    "has_refresher": list,
+    "has_attachment": dict,
+    "implied_qualification": list,
+    "remaining_days_table": dict,
+    "remaining_days_red": list,
+    "practice_red": list
+}
+
+# Initialise configuration shared by all modules in this process
+configuration = None
+configuration_lock = threading.Lock()
+
+
+# Class of configuration with lookup structures derived at load time
+class Configuration(dict):
+    """Configuration with lookup structures derived at load time."""
+
+    def __init__(self, data, path=None, mtime=None):
+        """Store configuration and derive lookup structures."""
+        super().__init__(data)
+        self.path = path
+        self.mtime = mtime
+
+        # Sets of qualification codes and highlighted values
+        self.bypass_qualification = set(self.get("bypass_qualification", []))
+        self.has_practice = set(self.get("has_practice", []))
+        self.remaining_days_red = set(
+                str(r) for r in self.get("remaining_days_red", []))
+        self.practice_red = set(str(p) for p in self.get("practice_red", []))
+
+        # Map of qualification code to repeat year of refresher training
+        self.refresher_map = {}
+        for t in self.get("has_refresher", []):
+            for q in t[0:-1]:
+                self.refresher_map[q] = t[-1]
+
+        # Table of implied qualification code, group and rank
+        self.implied_rank_table = pd.DataFrame(
+            [(q, g, r) for g, iq in enumerate(
+                self.get("implied_qualification", []))
+             for r, q in enumerate(iq)],
+            columns=["Qualification Code", "iq_group", "iq_rank"])
+
+        # Tables of remaining days triggering reminder
+        table = self.get("remaining_days_table", {})
+        self.trigger_table = pd.DataFrame(
+            [(q, r, i) for q, days in table.items() if q != "DEFAULT"
+             for i, r in enumerate(days)],
+            columns=["Qualification Code", "Days Remaining", "r_order"]
+            ).astype({"Days Remaining": int, "r_order": int})
+        self.default_trigger_table = pd.DataFrame(
+            [(r, i) for i, r in enumerate(table.get("DEFAULT", []))],
+            columns=["Days Remaining", "r_order"]).astype(int)
+
+        # Tables of courses which require job attachment and reminder days
+        attachment = self.get("has_attachment", {})
+        self.attachment_table = pd.DataFrame(
+            [(course, a[0], a[1], a[2], i)
+             for i, (course, a) in enumerate(attachment.items())],
+            columns=["Course Code", "att_q", "Job Attachment Required",
+                     "att_days", "att_order"])
+        self.attachment_days_table = pd.DataFrame(
+            [(course, d) for course, a in attachment.items() for d in a[-1]],
+            columns=["Course Code", "Days Remaining"]).drop_duplicates()
+
+    def is_outdated(self):
+        """Check if configuration file has changed since loaded."""
+        return self.mtime != os.path.getmtime(self.path)
+
+
+# Function to validate configuration
+def validate_configuration(config):
+    """Check if all required keys are present with the right types."""
+    errors = []
+    for key, key_type in CONFIGURATION_KEYS.items():
+        if key not in config:
+            errors.append("missing " + key)
+        elif not isinstance(config[key], key_type):
+            errors.append(key + " is not a " + key_type.__name__)
+
+    if isinstance(config.get("remaining_days_table"), dict) and \
+            "DEFAULT" not in config["remaining_days_table"]:
+        errors.append("missing DEFAULT in remaining_days_table")
+
+    if isinstance(config.get("team_admin"), dict):
+        for g, admin_list in config["team_admin"].items():
+            if not isinstance(admin_list, list):
+                errors.append("team_admin of " + g + " is not a list")
+
+    if len(errors) > 0:
+        raise ValueError("Invalid configuration file: " +
+                         "; ".join(errors) + '.')
+
+
 # Function to read configuration file
-def read_configuration_file():
-    """Read configuration file."""
-    # Open configuration file
-    with open("config.json") as config_file:
+def read_configuration_file(path="config.json"):
+    """Read configuration file, reloading it only if it has changed."""
+    global configuration
+
+    with configuration_lock:
+        if configuration is None or configuration.path != path or \
+                configuration.is_outdated():
+            # Get modification time before reading configuration file
+            mtime = os.path.getmtime(path)
+
+            # Open configuration file
+            with open(path) as config_file:
+
+                # Load configuration file
+                config = json.load(config_file)
+
+            # Set absolute file path with username
+            path_prefix = "C:/Users/" + os.getlogin() + '/'
+
+            for i in config:
+                if "abs_path" in i:
+                    config[i] = path_prefix + config[i]
+
+            # Validate configuration and derive lookup structures
+            validate_configuration(config)
+            configuration = Configuration(config, path, mtime)
+
+        return configuration
+
+
+# Function to process items with a pool of workers
+def run_worker_pool(items, workers, open_client, process, close_client):
+    """Process items with a pool of workers sharing one work queue."""
+    # Initialise work queue and results in the same order as items
+    work_queue = queue.Queue()
+    for i, item in enumerate(items):
+        work_queue.put((i, item))
+    results = [None] * len(items)
+
+    # Function run by each worker
+    def work():
+        # Open client owned by this worker
+        try:
+            client = open_client()
+
+        except BaseException as e:
+            handle_error_message(e)
+            return
+
+        try:
+            # Process items until the work queue is empty
+            while True:
+                try:
+                    i, item = work_queue.get_nowait()
+                except queue.Empty:
+                    break
+
+                results[i] = process(client, item)
+
+        finally:
+            # Close client owned by this worker
+            close_client(client)
+
+    # Start workers, but never more workers than items
+    threads = []
+    for w in range(max(1, min(int(workers), len(items)))):
+        thread = threading.Thread(target=work, daemon=True)
+        thread.start()
+        threads.append(thread)
+
+    # Wait for all workers to finish
+    for thread in threads:
+        thread.join()
+
+    return results
+
 
-        # Load configuration file
-        config = json.load(config_file)
+# Function to read individual record files of current staff
+def read_record_files(pattern, staff_numbers, read, workers=8,
+                      combine=True):
+    """Read individual record files concurrently and combine them once."""
+    # Filter away former staff by staff number in file name
+    files = []
+    for f in sorted(glob.glob(pattern)):
+        key = os.path.basename(f).split("_")
+        if key[2] in staff_numbers:
+            files.append((f, key))
 
-        # Set absolute file path with username
-        path_prefix = "C:/Users/" + os.getlogin() + '/'
+    # Read and tag files in worker threads
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        frames = list(executor.map(lambda fk: read(*fk), files))
 
-        for i in config:
-            if "abs_path" in i:
-                config[i] = path_prefix + config[i]
+    # Return results of all files if they are not to be combined
+    if not combine:
+        return frames
 
-    # Close configuration file
-    config_file.close()
+    # Return empty dataframe if there is no file
+    if len(frames) == 0:
+        return pd.DataFrame([])
 
-    return config
+    # Combine all files at once
+    return pd.concat(frames, ignore_index=True)
 
 
 if __name__ == "__main__":
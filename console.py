@@ -2,58 +2,44 @@
 """Running the command line interface console."""
 
 # Import libraries
-from common import get_timestamp, read_configuration_file
+from cache import report_practice_cache
+from common import get_time_difference, get_timestamp, \
+    handle_error_message, read_configuration_file
+from datetime import datetime, time as dt_time
+from metrics import set_gauge, write_metrics
+from outbox import drain_outbox
+from pipeline import Stage, run_pipeline
+from profiling import profiled
 from qalert import send_alert_email
 from qrecord import fetch_qualification_record
 from qreminder import send_daily_reminder_email, send_quarterly_reminder_email
 from qreport import generate_qualification_report
+from staff import get_staff_directory
+from store import export_record_files
 from talert import send_failed_training_alert_email
 from trecord import fetch_training_record
 from treport import generate_training_report, check_failed_training_records
 from treminder import send_training_reminder_email
-import pandas as pd
 import schedule
 import time
 
 
-# Function for fetching qualification records and send reminders daily
-def run_daily_enquiry_routine():
-    """Run daily enquiry routine."""
-    # Read configuration file
-    config = read_configuration_file()
-
-    # Fetch qualification records
-    failed = fetch_qualification_record(config)
-
-    # Send alert email to admin
+# Function for sending alert email on qualification record fetching
+def send_fetch_alert_email(config, failed):
+    """Send alert email to admin on failed cases of fetching."""
     if len(failed) == 0:
         send_alert_email(config, "q_alert_success")
 
-    elif len(failed) < len(pd.read_csv(config["staff_list_path"])):
+    elif len(failed) < len(get_staff_directory(config)):
         send_alert_email(config, "q_alert_partial_success", failed)
 
     else:
         send_alert_email(config, "q_alert_failure")
 
-    # Fetch training records
-    fetch_training_record(config)
-
-    # Generate training report
-    generate_training_report(config)
-
-
-# Function for sending daily reminder email
-def run_reminder_routine():
-    """Run reminder routine."""
-    # Read configuration file
-    config = read_configuration_file()
-
-    # Generate report
-    generate_qualification_report(config)
-
-    # Send daily reminder email
-    send_daily_reminder_email(config)
 
+# Function for sending quarterly reminder email if due today
+def send_quarterly_reminder_email_if_due(config):
+    """Send quarterly reminder email on the first day of a quarter."""
     # Get current date
     ddmm = get_timestamp(format="%d/%m")
     yyyy = get_timestamp(format="%Y")
@@ -72,14 +58,102 @@ def run_reminder_routine():
     else:
         pass
 
-    # Send training reminder email
-    send_training_reminder_email(config)
 
-    # Check failed training records
-    df_failed = check_failed_training_records(config)
+# Function for fetching qualification records and send reminders daily
+def run_daily_enquiry_routine():
+    """Run daily enquiry routine."""
+    # Read configuration file
+    config = read_configuration_file()
 
-    # Send failed training alert email
-    send_failed_training_alert_email(config, df_failed)
+    # Fetch qualification and training records concurrently
+    stages = [
+        Stage("fetch_qualification",
+              lambda: fetch_qualification_record(config)),
+        Stage("send_alert",
+              lambda failed: send_fetch_alert_email(config, failed),
+              ["fetch_qualification"]),
+        Stage("fetch_training", lambda: fetch_training_record(config)),
+        Stage("generate_training_report",
+              lambda failed: generate_training_report(config),
+              ["fetch_training"])
+    ]
+
+    # Export individual record files from record store if required
+    if config.get("export_record_files", False):
+        stages.append(Stage(
+            "export_record_files",
+            lambda q_failed, t_failed: export_record_files(config),
+            ["fetch_qualification", "fetch_training"]))
+
+    start_time = datetime.now()
+    run_pipeline("daily enquiry routine", stages,
+                 config.get("pipeline_workers", 4))
+    end_time = datetime.now()
+
+    # Record how long the routine took and how much time is left before
+    # reminder routine starts on the same records
+    set_gauge("tqm_run_duration_seconds",
+              get_time_difference(start_time, end_time), run="daily_enquiry")
+    reminder_time = datetime.combine(
+        end_time.date(), dt_time.fromisoformat(config["reminder_time"]))
+    set_gauge("tqm_reminder_headroom_seconds",
+              get_time_difference(end_time, reminder_time))
+
+    # Export metrics of the routine
+    write_metrics(config, "daily_enquiry")
+
+
+# Function for sending daily reminder email
+def run_reminder_routine():
+    """Run reminder routine."""
+    # Read configuration file
+    config = read_configuration_file()
+
+    # Send reminders once report is generated and alerts concurrently,
+    # where quarterly reminder runs after daily reminder, even if it fails,
+    # so that practice records fetched for daily reminder are read from cache
+    start_time = datetime.now()
+    run_pipeline("reminder routine", [
+        Stage("generate_qualification_report",
+              lambda: generate_qualification_report(config)),
+        Stage("send_daily_reminder",
+              lambda df_all: send_daily_reminder_email(config),
+              ["generate_qualification_report"]),
+        Stage("send_quarterly_reminder",
+              lambda df_all: send_quarterly_reminder_email_if_due(config),
+              ["generate_qualification_report"],
+              after=["send_daily_reminder"]),
+        Stage("send_training_reminder",
+              lambda df_all: send_training_reminder_email(config),
+              ["generate_qualification_report"]),
+        Stage("check_failed_training",
+              lambda: check_failed_training_records(config)),
+        Stage("send_failed_training_alert",
+              lambda df_failed: send_failed_training_alert_email(
+                  config, df_failed),
+              ["check_failed_training"])
+    ], config.get("pipeline_workers", 4))
+
+    # Record how long the routine took and export its metrics
+    set_gauge("tqm_run_duration_seconds",
+              get_time_difference(start_time, datetime.now()),
+              run="reminder")
+    write_metrics(config, "reminder")
+
+    # Report practice cache hit and miss counts
+    report_practice_cache()
+
+
+# Function for running a routine
+def run_routine(name, routine):
+    """Run a routine under profilers if --profile option is given."""
+    # Keep the console running and the routine scheduled if it fails
+    try:
+        with profiled(read_configuration_file(), name):
+            routine()
+
+    except Exception as e:
+        handle_error_message("Routine " + name + " failed: " + str(e))
 
 
 if __name__ == "__main__":
@@ -89,9 +163,14 @@ if __name__ == "__main__":
     # Read configuration file
     config = read_configuration_file()
 
+    # Send emails left in outbox by previous run
+    drain_outbox(config)
+
     # Schedule the routines
-    schedule.every().day.at(config["fetch_time"]).do(run_daily_enquiry_routine)
-    schedule.every().day.at(config["reminder_time"]).do(run_reminder_routine)
+    schedule.every().day.at(config["fetch_time"]).do(
+        run_routine, "daily_enquiry", run_daily_enquiry_routine)
+    schedule.every().day.at(config["reminder_time"]).do(
+        run_routine, "reminder", run_reminder_routine)
 
     while True:
         try:
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""Send email through Outlook or SMTP."""
+
+# Import libraries
+from common import get_timestamp, read_configuration_file
+from email.mime.image import MIMEImage
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+import mimetypes
+import os
+import smtplib
+import threading
+
+# Import Outlook automation if available
+try:
+    import pythoncom
+    import win32com.client
+except ImportError:
+    win32com = None
+
+# Initialise mail transports owned by each thread
+mail_transports = threading.local()
+
+
+# Function to build an email message
+def build_message(to, cc, subject, html):
+    """Build an email message with recipient lists and HTML body."""
+    return {"to": list(to), "cc": list(cc), "subject": subject,
+            "html": html}
+
+
+# Class of mail transport through Outlook
+class OutlookTransport:
+    """Send email through one Outlook application per run."""
+
+    def __init__(self, config):
+        """Open Outlook application."""
+        if win32com is None:
+            raise RuntimeError("Outlook is not available on this machine.")
+
+        # Initialise COM in the thread owning this transport
+        pythoncom.CoInitialize()
+        self.outlook = win32com.client.Dispatch('outlook.application')
+        self.logo = os.path.abspath(config["email_sender"]["corp_logo"])
+
+    def send(self, message, display=False):
+        """Send or display an email."""
+        # Create new email
+        mail = self.outlook.CreateItem(0)
+
+        # Insert corporate logo in email
+        attachment = mail.Attachments.Add(self.logo)
+        attachment.PropertyAccessor.SetProperty(
+                "http://schemas.microsoft.com/mapi/proptag/0x3712001F",
+                "logo")
+
+        # Set receivers, subject and body content in HTML
+        mail.To = "; ".join(message["to"])
+        mail.CC = "; ".join(message["cc"])
+        mail.Subject = message["subject"]
+        mail.HTMLBody = message["html"]
+
+        # Display email for inspection
+        if display:
+            mail.Display()
+
+        # Send email
+        else:
+            mail.Send()
+
+    def close(self):
+        """Release Outlook application."""
+        self.outlook = None
+        pythoncom.CoUninitialize()
+
+
+# Class of mail transport through SMTP
+class SMTPTransport:
+    """Send email over one persistent SMTP connection."""
+
+    def __init__(self, config):
+        """Load corporate logo once and connect to SMTP server."""
+        self.config = config
+        self.sender = config.get("smtp_sender",
+                                 config["email_sender"]["admin_email"])
+        self.connection = None
+
+        # Load corporate logo as an inline part shared by all emails
+        logo = config["email_sender"]["corp_logo"]
+        with open(logo, "rb") as file:
+            self.logo = MIMEImage(file.read(), _subtype=(
+                mimetypes.guess_type(logo)[0] or "image/png").split('/')[1])
+        self.logo.add_header("Content-ID", "<logo>")
+        self.logo.add_header("Content-Disposition", "inline",
+                             filename=os.path.basename(logo))
+
+        self.connect()
+
+    def connect(self):
+        """Connect and log in to SMTP server."""
+        self.connection = smtplib.SMTP(
+                self.config.get("smtp_host", "localhost"),
+                self.config.get("smtp_port", 25),
+                timeout=self.config.get("smtp_timeout", 30))
+
+        if self.config.get("smtp_starttls", False):
+            self.connection.starttls()
+
+        if self.config.get("smtp_username") is not None:
+            self.connection.login(self.config["smtp_username"],
+                                  self.config["smtp_password"])
+
+    def send(self, message, display=False):
+        """Send an email or save it for inspection."""
+        # Compose email with HTML body and inline corporate logo
+        mail = MIMEMultipart("related")
+        mail["From"] = self.sender
+        mail["To"] = ", ".join(message["to"])
+        if len(message["cc"]) > 0:
+            mail["Cc"] = ", ".join(message["cc"])
+        mail["Subject"] = message["subject"]
+        mail.attach(MIMEText(message["html"], "html", "utf-8"))
+        mail.attach(self.logo)
+
+        # Save email in temporary folder for inspection
+        if display:
+            path = "temp/mail_" + get_timestamp(
+                    format="%Y%m%d-%H%M%S-%f") + ".eml"
+            with open(path, "wb") as file:
+                file.write(mail.as_bytes())
+
+            print("[" + get_timestamp() + "] Saved email as " + path + '.')
+            return
+
+        # Send email, reconnecting once if server has closed connection
+        try:
+            self.connection.send_message(
+                    mail, self.sender, message["to"] + message["cc"])
+
+        except smtplib.SMTPServerDisconnected:
+            self.connect()
+            self.connection.send_message(
+                    mail, self.sender, message["to"] + message["cc"])
+
+    def close(self):
+        """Close SMTP connection."""
+        try:
+            self.connection.quit()
+
+        except smtplib.SMTPException:
+            self.connection.close()
+
+
+# Function to open a mail transport
+def open_mail_transport(config):
+    """Open a mail transport of the configured backend."""
+    if config.get("mail_transport", "outlook") == "smtp":
+        return SMTPTransport(config)
+
+    return OutlookTransport(config)
+
+
+# Function to get mail transport of this thread
+def get_mail_transport(config):
+    """Get mail transport of this thread, opening it on first use."""
+    transport = getattr(mail_transports, "transport", None)
+
+    if transport is None:
+        transport = open_mail_transport(config)
+        mail_transports.transport = transport
+
+    return transport
+
+
+# Function to close mail transport of this thread
+def close_mail_transport():
+    """Close mail transport of this thread at the end of a run."""
+    transport = getattr(mail_transports, "transport", None)
+
+    if transport is not None:
+        mail_transports.transport = None
+        transport.close()
+
+
+if __name__ == "__main__":
+    # Read configuration file
+    config = read_configuration_file()
+
+    # Send a test email to admin
+    get_mail_transport(config).send(build_message(
+        [config["email_sender"]["admin_email"]], [], "Test Email on " +
+        get_timestamp(format="%d/%m/%Y"), "<p>Test email.</p>"))
+    close_mail_transport()
+
+    print("[" + get_timestamp() + "] Sent test email to admin.")
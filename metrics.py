@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""Record run metrics and export them for monitoring."""
+
+# Import libraries
+from common import get_timestamp, read_configuration_file
+from contextlib import contextmanager
+import json
+import os
+import threading
+import time
+
+# Upper bounds of histogram buckets in seconds
+BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600]
+
+# Initialise metrics of this run
+histograms = {}
+counters = {}
+gauges = {}
+metrics_lock = threading.Lock()
+
+
+# Function to get key of a metric with labels
+def get_metric_key(name, labels):
+    """Get key of a metric from its name and sorted labels."""
+    return name, tuple(sorted(labels.items()))
+
+
+# Function to record an observation in a histogram
+def observe(name, value, **labels):
+    """Record a duration in seconds in a histogram."""
+    with metrics_lock:
+        h = histograms.setdefault(get_metric_key(name, labels), {
+            "buckets": [0] * len(BUCKETS), "count": 0, "sum": 0.0,
+            "min": value, "max": value})
+
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                h["buckets"][i] += 1
+        h["count"] += 1
+        h["sum"] += value
+        h["min"] = min(h["min"], value)
+        h["max"] = max(h["max"], value)
+
+
+# Function to increase a counter
+def increment(name, value=1, **labels):
+    """Increase a counter by value."""
+    with metrics_lock:
+        key = get_metric_key(name, labels)
+        counters[key] = counters.get(key, 0) + value
+
+
+# Function to set a gauge
+def set_gauge(name, value, **labels):
+    """Set a gauge to value."""
+    with metrics_lock:
+        gauges[get_metric_key(name, labels)] = value
+
+
+# Function to time a block or a function
+@contextmanager
+def timed(name, **labels):
+    """Record wall time of a block or of each call of a function."""
+    start_time = time.perf_counter()
+
+    try:
+        yield
+
+    finally:
+        observe(name, time.perf_counter() - start_time, **labels)
+
+
+# Function to format labels of a metric in Prometheus format
+def format_labels(labels, extra=()):
+    """Format labels in Prometheus text format."""
+    labels = list(labels) + list(extra)
+    if len(labels) == 0:
+        return ""
+
+    return "{" + ",".join(
+        k + '="' + str(v).replace('\\', '\\\\').replace('"', '\\"') + '"'
+        for k, v in labels) + "}"
+
+
+# Function to format all metrics in Prometheus format
+def format_prometheus():
+    """Format all metrics in Prometheus text format."""
+    lines = []
+
+    # Write histograms with cumulative buckets
+    for name in sorted(set(k[0] for k in histograms)):
+        lines.append("# TYPE " + name + " histogram")
+        for (n, labels), h in sorted(histograms.items()):
+            if n != name:
+                continue
+            for bound, count in zip(BUCKETS, h["buckets"]):
+                lines.append(name + "_bucket" + format_labels(
+                    labels, [("le", str(bound))]) + " " + str(count))
+            lines.append(name + "_bucket" + format_labels(
+                labels, [("le", "+Inf")]) + " " + str(h["count"]))
+            lines.append(name + "_sum" + format_labels(labels) + " " +
+                         repr(h["sum"]))
+            lines.append(name + "_count" + format_labels(labels) + " " +
+                         str(h["count"]))
+
+    # Write counters and gauges
+    for metrics, metric_type in ((counters, "counter"), (gauges, "gauge")):
+        for name in sorted(set(k[0] for k in metrics)):
+            lines.append("# TYPE " + name + " " + metric_type)
+            for (n, labels), value in sorted(metrics.items()):
+                if n == name:
+                    lines.append(name + format_labels(labels) + " " +
+                                 repr(value))
+
+    return "\n".join(lines) + "\n"
+
+
+# Function to summarise all metrics in JSON format
+def format_summary(run):
+    """Summarise all metrics of a run in JSON format."""
+    return json.dumps({
+        "run": run,
+        "time": get_timestamp(),
+        "histograms": [
+            {"name": n, "labels": dict(labels), "count": h["count"],
+             "sum": h["sum"], "mean": h["sum"] / h["count"],
+             "min": h["min"], "max": h["max"]}
+            for (n, labels), h in sorted(histograms.items())],
+        "counters": [
+            {"name": n, "labels": dict(labels), "value": value}
+            for (n, labels), value in sorted(counters.items())],
+        "gauges": [
+            {"name": n, "labels": dict(labels), "value": value}
+            for (n, labels), value in sorted(gauges.items())]
+    }, indent=2)
+
+
+# Function to write a file atomically
+def write_file_atomically(path, content):
+    """Write a file so that readers never see a partial file."""
+    with open(path + ".tmp", "w", encoding="utf-8") as file:
+        file.write(content)
+    os.replace(path + ".tmp", path)
+
+
+# Function to write metrics of a run
+def write_metrics(config, run):
+    """Write metrics of a run as Prometheus textfile and JSON summary."""
+    path = config.get("metrics_path", "temp/metrics")
+    os.makedirs(path, exist_ok=True)
+
+    with metrics_lock:
+        # Record when the run has completed
+        gauges[get_metric_key("tqm_run_completed_timestamp_seconds",
+                              {"run": run})] = time.time()
+
+        write_file_atomically(path + "/" + run + ".prom",
+                              format_prometheus())
+        write_file_atomically(path + "/" + run + ".json",
+                              format_summary(run))
+
+        # Reset metrics for the next run
+        histograms.clear()
+        counters.clear()
+        gauges.clear()
+
+
+if __name__ == "__main__":
+    # Read configuration file
+    config = read_configuration_file()
+
+    # Print summaries of last runs
+    path = config.get("metrics_path", "temp/metrics")
+    for f in sorted(os.listdir(path)) if os.path.isdir(path) else []:
+        if f.endswith(".json"):
+            with open(path + "/" + f, "r", encoding="utf-8") as file:
+                summary = json.load(file)
+            print("[" + get_timestamp() + "] " + summary["run"] +
+                  " completed at " + summary["time"] + '.')
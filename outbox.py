@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""Queue composed email in an outbox and send it with a pool of workers."""
+
+# Import libraries
+from common import get_timestamp, handle_error_message, \
+    read_configuration_file, run_worker_pool
+from mail import open_mail_transport
+from metrics import increment, timed
+from profiling import profiled
+from store import read_sent_email_keys, record_sent_email
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+
+# Allow only one drain of the outbox at a time in this process
+outbox_lock = threading.Lock()
+
+
+# Class of rate limit shared by all sender workers
+class RateLimiter:
+    """Space out sending so that no more than rate emails go per second."""
+
+    def __init__(self, rate):
+        """Initialise interval between two emails."""
+        self.interval = 1 / rate if rate > 0 else 0
+        self.next_time = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        """Wait for the next free sending slot."""
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+
+        if delay > 0:
+            time.sleep(delay)
+
+
+# Function to get outbox folder
+def get_outbox_path(config):
+    """Get outbox folder, creating it if not exists."""
+    path = config.get("outbox_path", "temp/outbox")
+    os.makedirs(path, exist_ok=True)
+
+    return path
+
+
+# Function to read keys of emails sent today or waiting in the outbox
+def read_pending_email_keys(config):
+    """Read keys of emails which are not to be sent again today."""
+    # List outbox before reading ledger, so that a message sent in between
+    # is found in ledger
+    files = glob.glob(get_outbox_path(config) + "/*.json")
+    keys = read_sent_email_keys(config)
+
+    for f in files:
+        # Message sent meanwhile is already recorded in ledger
+        try:
+            with open(f, "r", encoding="utf-8") as file:
+                key = json.load(file).get("key")
+
+        except FileNotFoundError:
+            continue
+
+        if key is not None:
+            keys.add(tuple(key))
+
+    return keys
+
+
+# Function to write a message file
+def write_message(path, message):
+    """Write a message file atomically."""
+    # Write to a temporary file first so that a crash leaves no partial file
+    with open(path[:-5] + ".tmp", "w", encoding="utf-8") as file:
+        json.dump(message, file)
+    os.replace(path[:-5] + ".tmp", path)
+
+
+# Function to put a message in the outbox
+def enqueue_message(config, message, description, key=None):
+    """Write a message to the outbox atomically."""
+    path = get_outbox_path(config) + "/" + get_timestamp(
+            format="%Y%m%d-%H%M%S-%f") + "_" + uuid.uuid4().hex[:8] + ".json"
+    write_message(path, dict(message, description=description, key=key))
+
+    return path
+
+
+# Function to move a message out of the outbox
+def move_to_dead_letter(config, path, message, error):
+    """Move a message which cannot be sent to the dead letter folder."""
+    dead_letter_path = config.get("dead_letter_path", "temp/dead_letter")
+    os.makedirs(dead_letter_path, exist_ok=True)
+
+    write_message(path, dict(message, error=str(error)))
+    os.replace(path, dead_letter_path + "/" + os.path.basename(path))
+
+    handle_error_message(
+            "Gave up sending " + message["description"] + " after " +
+            str(message["attempts"]) + " attempt(s): " + str(error))
+
+
+# Function to send a message in the outbox
+def send_outbox_message(config, transport, limiter, path):
+    """Send a message with retry and remove it from the outbox once sent."""
+    with open(path, "r", encoding="utf-8") as file:
+        message = json.load(file)
+
+    retries = config.get("mail_retries", 3)
+    for trial in range(retries):
+        limiter.wait()
+
+        try:
+            with timed("tqm_email_send_seconds"):
+                transport.send(message)
+
+        except Exception as e:
+            increment("tqm_email_send_failures_total")
+            print("[" + get_timestamp() + "] Failed to send " +
+                  message["description"] + " (Trial #" + str(trial + 1) +
+                  ").")
+
+            # Count failed attempts over all drains
+            message["attempts"] = message.get("attempts", 0) + 1
+
+            # Move message which keeps failing out of the outbox
+            if message["attempts"] >= config.get("mail_max_attempts", 9):
+                move_to_dead_letter(config, path, message, e)
+
+                # Return nothing as message is neither sent nor left
+                return None
+
+            # Back off before next trial if not last trial
+            if trial < retries - 1:
+                time.sleep(config.get("mail_backoff", 2) * 2 ** trial)
+
+            continue
+
+        # Record sent message in ledger and remove it from outbox
+        if message.get("key") is not None:
+            record_sent_email(config, tuple(message["key"]))
+        os.remove(path)
+        increment("tqm_emails_sent_total")
+
+        # Print confirmation on console
+        print("[" + get_timestamp() + "] Sent " + message["description"] +
+              '.')
+
+        return True
+
+    # Keep failed attempts for the next drain
+    write_message(path, message)
+
+    return False
+
+
+# Function to send all messages in the outbox
+def drain_outbox(config):
+    """Send all messages in the outbox with a pool of sender workers."""
+    with outbox_lock:
+        # Send messages in the order they were queued
+        files = sorted(glob.glob(get_outbox_path(config) + "/*.json"))
+        if len(files) == 0:
+            return []
+
+        limiter = RateLimiter(config.get("mail_rate", 5))
+
+        # Split the messages between a pool of sender workers
+        results = run_worker_pool(
+                files, config.get("mail_workers", 4),
+                lambda: open_mail_transport(config),
+                lambda transport, f: send_outbox_message(
+                    config, transport, limiter, f),
+                lambda transport: transport.close())
+
+        # Messages not sent stay in the outbox for the next drain
+        failed = [f for f, r in zip(files, results) if r is False]
+        if len(failed) > 0:
+            print("[" + get_timestamp() + "] " + str(len(failed)) +
+                  " email(s) left in outbox.")
+
+        return failed
+
+
+if __name__ == "__main__":
+    # Read configuration file
+    config = read_configuration_file()
+
+    # Run under profilers if --profile option is given
+    with profiled(config, "outbox"):
+        # Send messages left in the outbox
+        drain_outbox(config)
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""Run routines as pipelines of dependent stages."""
+
+# Import libraries
+from common import get_time_difference, get_timestamp, handle_error_message
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+from metrics import observe
+
+
+# Class of pipeline stage
+class Stage:
+    """Stage of a pipeline taking the outputs of its input stages."""
+
+    def __init__(self, name, function, inputs=(), after=()):
+        """Initialise stage with its function and input stage names."""
+        self.name = name
+        self.function = function
+        self.inputs = list(inputs)
+
+        # Stages to finish first, whether they succeed or fail
+        self.after = list(after)
+
+
+# Function to run a stage and time it
+def run_stage(stage, inputs):
+    """Run a stage and get its output and wall time in seconds."""
+    start_time = datetime.now()
+    output = stage.function(*inputs)
+    seconds = get_time_difference(start_time, datetime.now())
+
+    # Record wall time of stage in metrics of this run
+    observe("tqm_stage_duration_seconds", seconds, stage=stage.name)
+
+    return output, seconds
+
+
+# Function to run a pipeline
+def run_pipeline(name, stages, workers=4):
+    """Run stages concurrently as soon as their input stages are done."""
+    # Check if all input stages are declared
+    names = set(stage.name for stage in stages)
+    for stage in stages:
+        for i in stage.inputs + stage.after:
+            if i not in names:
+                raise ValueError("Unknown input " + i + " of stage " +
+                                 stage.name + '.')
+
+    print("[" + get_timestamp() + "] Running " + name + "...")
+
+    outputs = {}
+    timings = {}
+    failed = set()
+    pending = list(stages)
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while len(pending) > 0 or len(running) > 0:
+            # Skip stages of which any input stage has failed, repeating
+            # until stages further down are skipped as well
+            skipped = True
+            while skipped:
+                skipped = [s for s in pending
+                           if any(i in failed for i in s.inputs)]
+                for stage in skipped:
+                    pending.remove(stage)
+                    failed.add(stage.name)
+                    print("[" + get_timestamp() + "] Skipped stage " +
+                          stage.name + '.')
+
+            # Start stages of which all input stages are done and all
+            # preceding stages have finished
+            for stage in [s for s in pending
+                          if all(i in outputs for i in s.inputs) and
+                          all(i in outputs or i in failed
+                              for i in s.after)]:
+                pending.remove(stage)
+                running[executor.submit(
+                    run_stage, stage,
+                    [outputs[i] for i in stage.inputs])] = stage
+
+            # Stop if remaining stages wait for each other
+            if len(running) == 0:
+                if len(pending) > 0:
+                    raise ValueError("Cyclic inputs among stages " + ", ".join(
+                        s.name for s in pending) + '.')
+                break
+
+            # Collect outputs of finished stages
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+
+                try:
+                    outputs[stage.name], timings[stage.name] = \
+                        future.result()
+
+                except BaseException as e:
+                    failed.add(stage.name)
+                    handle_error_message(
+                            "Stage " + stage.name + " failed: " + str(e))
+
+    # Print wall time of each stage
+    for stage in stages:
+        if stage.name in timings:
+            print("[" + get_timestamp() + "] Stage " + stage.name +
+                  " completed in " + format(timings[stage.name], ".2f") +
+                  " s.")
+
+    return outputs, timings
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""Communicate with the enquiry portal over HTTP."""
+
+# Import libraries
+from common import get_timestamp, read_configuration_file
+from lxml import html as lxml_html
+from requests.adapters import HTTPAdapter
+from urllib.parse import urljoin
+import re
+import requests
+
+
+# Function to open HTTP session with the enquiry portal
+def open_portal_session(config):
+    """Open a keep-alive HTTP session with the enquiry portal."""
+    # Initialise session with a pool of persistent connections
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=4)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    # Present the session as a normal browser
+    session.headers["User-Agent"] = config.get(
+            "http_user_agent",
+            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) " +
+            "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/130.0 " +
+            "Safari/537.36")
+
+    return session
+
+
+# Function to get a page from the enquiry portal
+def get_page(config, session, link):
+    """Get a page from the enquiry portal."""
+    response = session.get(link, timeout=config.get("http_timeout", 30))
+    response.raise_for_status()
+
+    return response
+
+
+# Function to submit the ASP.NET form on a page
+def submit_form(config, session, link, page_source, fields, button_id):
+    """Submit ASP.NET form with its view state and event validation."""
+    # Parse page source
+    document = lxml_html.fromstring(page_source)
+    form = document.forms[0]
+
+    # Collect all form values including __VIEWSTATE and __EVENTVALIDATION
+    data = dict(form.form_values())
+
+    # Fill in fields by element ID
+    for element_id, value in fields.items():
+        data[document.get_element_by_id(element_id).get("name")] = value
+
+    # Find the button to be clicked
+    button = document.get_element_by_id(button_id)
+
+    # Submit button posts its own name and value
+    if button.tag in ("input", "button"):
+        data[button.get("name")] = button.get("value", "")
+
+    # Link button posts back through __doPostBack
+    else:
+        data["__EVENTTARGET"] = re.search(
+                r"__doPostBack\('([^']*)'", button.get("href")).group(1)
+        data["__EVENTARGUMENT"] = ""
+
+    # Post form to its action
+    response = session.post(
+            urljoin(link, form.get("action") or link), data=data,
+            timeout=config.get("http_timeout", 30))
+    response.raise_for_status()
+
+    return response
+
+
+# Function to request qualification page of a staff
+def request_qualification_page(config, session, staff_id):
+    """Request qualification page of a staff without a browser."""
+    # Browse webpage
+    link = config["enquiry_qualification_link"]
+    page_source = get_page(config, session, link).text
+
+    # Fill in staff number and click "Search" button
+    page_source = submit_form(
+            config, session, link, page_source,
+            {"ctl00_cphContent_txtEnquiryStaffNo_txtStaffNo": staff_id},
+            "ctl00_cphContent_btnEnquiry").text
+
+    # Check if "Data Download" button is shown
+    if 'id="ctl00_cphContent_btnExport"' not in page_source:
+        raise ValueError("No qualification record found for " + staff_id +
+                         '.')
+
+    return page_source
+
+
+# Function to request practice page of a staff and qualification
+def request_practice_page(config, session, sid, q_code, since):
+    """Request CQAS practice page without a browser."""
+    # Browse webpage
+    link = config["enquiry_practice_link"]
+    page_source = get_page(config, session, link).text
+
+    # Click "Clear" button
+    page_source = submit_form(
+            config, session, link, page_source, {},
+            "ctl00_cphContent_btnClear_Pract").text
+
+    # Fill in staff number and click "Search" button
+    page_source = submit_form(
+            config, session, link, page_source,
+            {"ctl00_cphContent_txtSearchStaff_Pract_txtStaffNo": sid},
+            "ctl00_cphContent_btnSearch_Pract").text
+
+    # Click "Cancel" button
+    page_source = submit_form(
+            config, session, link, page_source, {},
+            "ctl00_cphContent_btnBack").text
+
+    # Fill in qualification code and start date and click "Search" button
+    page_source = submit_form(
+            config, session, link, page_source,
+            {"ctl00_cphContent_txtQual_Pract": q_code,
+             "ctl00_cphContent_txtDateForSearchFrom_dateTextBox": since},
+            "ctl00_cphContent_btnSearch_Pract").text
+
+    # Check if "Data Download" button is shown
+    if 'id="ctl00_cphContent_btnDownLoad"' not in page_source:
+        raise ValueError("No practice record found for " + sid + '.')
+
+    return page_source
+
+
+# Function to request training record download of a staff
+def request_training_download(config, session, staff_id):
+    """Request training record file of a staff into memory."""
+    # Browse webpage
+    link = config["enquiry_training_link"]
+    page_source = get_page(config, session, link).text
+
+    # Fill in staff number and click "Data Download" button
+    response = submit_form(
+            config, session, link, page_source,
+            {"ctl00_cphContent_txtTrainingStaffNo_txtStaffNo": staff_id},
+            "ctl00_cphContent_btnDown")
+
+    # Check if a file is returned instead of a page
+    if "text/html" in response.headers.get("Content-Type", "") and \
+            "attachment" not in response.headers.get(
+                "Content-Disposition", ""):
+        raise ValueError("No training record file returned for " +
+                         staff_id + '.')
+
+    return response.content
+
+
+if __name__ == "__main__":
+    # Read configuration file
+    config = read_configuration_file()
+
+    # Check connection to the enquiry portal
+    session = open_portal_session(config)
+    get_page(config, session, config["enquiry_qualification_link"])
+    session.close()
+
+    print("[" + get_timestamp() + "] Connected to the enquiry portal.")
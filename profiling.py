@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""Profile time and memory of a stage when requested on command line."""
+
+# Import libraries
+from common import get_timestamp, read_configuration_file
+from contextlib import contextmanager
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import tracemalloc
+
+
+# Function to check if profiling is requested on command line
+def is_profile_requested():
+    """Check if --profile option is given on command line."""
+    return "--profile" in sys.argv[1:]
+
+
+# Class of sampler of call stacks
+class StackSampler(threading.Thread):
+    """Sample call stacks of all threads at a fixed interval."""
+
+    def __init__(self, interval):
+        """Initialise sampler with interval in seconds."""
+        super().__init__(name="StackSampler", daemon=True)
+        self.interval = interval
+        self.counts = {}
+        self.stopped = threading.Event()
+
+    def run(self):
+        """Count collapsed call stacks until stopped."""
+        while not self.stopped.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+
+            for ident, frame in sys._current_frames().items():
+                if ident == self.ident:
+                    continue
+
+                # Collapse call stack from outermost to innermost frame
+                stack = []
+                while frame is not None:
+                    stack.append(os.path.basename(frame.f_code.co_filename) +
+                                 ":" + frame.f_code.co_name)
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+
+                key = ";".join(reversed(stack))
+                self.counts[key] = self.counts.get(key, 0) + 1
+
+    def stop(self):
+        """Stop sampling and wait for sampler to finish."""
+        self.stopped.set()
+        self.join()
+
+
+# Function to run a block under profilers
+@contextmanager
+def profiled(config, name, enabled=None):
+    """Profile a block with cProfile, stack sampling and tracemalloc."""
+    if enabled is None:
+        enabled = is_profile_requested()
+
+    if not enabled:
+        yield
+        return
+
+    path = config.get("profile_path", "temp/profile")
+    os.makedirs(path, exist_ok=True)
+    prefix = path + "/" + name + "_" + get_timestamp(format="%Y%m%d-%H%M%S")
+
+    # Start profilers, where cProfile covers the calling thread only and
+    # stack sampling covers worker threads as well
+    tracemalloc.start(config.get("profile_traceback", 1))
+    sampler = StackSampler(config.get("profile_interval", 0.005))
+    sampler.start()
+    profiler = cProfile.Profile()
+    profiler.enable()
+
+    try:
+        yield
+
+    finally:
+        # Stop profilers
+        profiler.disable()
+        sampler.stop()
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        # Write call stats sorted by cumulative time
+        profiler.dump_stats(prefix + ".prof")
+        stream = io.StringIO()
+        pstats.Stats(profiler, stream=stream).sort_stats(
+            config.get("profile_sort", "cumulative")).print_stats(
+            config.get("profile_limit", 100))
+        with open(prefix + "_stats.txt", "w", encoding="utf-8") as file:
+            file.write(stream.getvalue())
+
+        # Write collapsed stacks for flamegraph tools
+        with open(prefix + ".folded", "w", encoding="utf-8") as file:
+            for stack, count in sorted(sampler.counts.items()):
+                file.write(stack + " " + str(count) + "\n")
+
+        # Write top allocation sites
+        statistics = snapshot.filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__)]).statistics("lineno")
+        with open(prefix + "_memory.txt", "w", encoding="utf-8") as file:
+            file.write("Peak: " + format(peak / 1024, ".1f") + " KiB\n")
+            file.write("Current: " + format(current / 1024, ".1f") +
+                       " KiB\n\n")
+            for stat in statistics[:config.get("profile_limit", 100)]:
+                file.write(str(stat) + "\n")
+
+        print("[" + get_timestamp() + "] Wrote profile of " + name +
+              " to " + prefix + ".*")
+
+
+if __name__ == "__main__":
+    # Read configuration file
+    config = read_configuration_file()
+
+    # Print profiles written so far
+    path = config.get("profile_path", "temp/profile")
+    for f in sorted(os.listdir(path)) if os.path.isdir(path) else []:
+        print("[" + get_timestamp() + "] " + path + "/" + f)
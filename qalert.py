@@ -3,42 +3,29 @@
 
 # Import libraries
 from common import get_timestamp, read_configuration_file
-import pandas as pd
-import win32com.client
-import os
+from mail import build_message, close_mail_transport, get_mail_transport
+from outbox import drain_outbox, enqueue_message, read_pending_email_keys
+from profiling import profiled
+from render import render_template
+from staff import get_staff_directory
+from store import get_email_key
 
 
 # Function for sending an alert email
 def send_alert_email(config, html, failed=None, display=False):
     """Send an alert email."""
-    # Open Outlook application
-    outlook = win32com.client.Dispatch('outlook.application')
-
-    # Create new email
-    mail = outlook.CreateItem(0)
-
-    # Insert corporate logo in email
-    attachment = mail.Attachments.Add(
-            os.path.abspath(config["email_sender"]["corp_logo"]))
-    attachment.PropertyAccessor.SetProperty(
-        "http://schemas.microsoft.com/mapi/proptag/0x3712001F", "logo")
-
-    # Load alert email template
-    with open("template/" + html + ".html", "r") as file:
-        content = file.read()
-
-    # Replace sender's details placeholders in email
-    for key, value in config["email_sender"].items():
-        try:
-            content = content.replace("{{ " + key + " }}", value)
-
-        except BaseException:
-            pass
+    # Skip email which has been sent today
+    key = get_email_key(config["email_sender"]["admin_email"], html,
+                        failed)
+    if not display and key in read_pending_email_keys(config):
+        print('[' + get_timestamp() +
+              "] Skipped alert email to admin as it has been sent today.")
+        return
 
     # Get staff names in failed list
     if failed is not None:
-        # Read staff list
-        df_staff = pd.read_csv(config["staff_list_path"], dtype="string")
+        # Get staff directory
+        staff = get_staff_directory(config)
         failed_name = ""
 
         # Get number of failed cases
@@ -46,43 +33,40 @@ def send_alert_email(config, html, failed=None, display=False):
 
         # Iterate through all failed cases
         for s in failed:
-            failed_name = failed_name + "<br> - " + df_staff.loc[
-                    df_staff["Staff Number"] == str(s),
-                    "Name"].values[0]
+            failed_name = failed_name + "<br> - " + staff.name(str(s))
 
-        # Replace placeholders in email
-        content = content.replace("{{ number_of_failed }}", number_of_failed)
-        content = content.replace("{{ failed_name }}", failed_name)
+        # Render alert email template with failed cases
+        content = render_template(config, html,
+                                  number_of_failed=number_of_failed,
+                                  failed_name=failed_name)
 
     else:
-        pass
-
-    # Receiver's email
-    mail.To = config["email_sender"]["admin_email"]
+        # Render alert email template
+        content = render_template(config, html)
 
-    # Email subject
-    mail.Subject = "Daily Qualification Enquiry Report on " + \
-        get_timestamp(format="%d/%m/%Y")
-
-    # Email body content in HTML
-    mail.HTMLBody = content
+    # Email to admin
+    message = build_message(
+            [config["email_sender"]["admin_email"]], [],
+            "Daily Qualification Enquiry Report on " +
+            get_timestamp(format="%d/%m/%Y"), content)
 
     # Display email for checking
     if display:
-        mail.Display()
+        get_mail_transport(config).send(message, display=True)
 
-    # Send email
+    # Queue email in outbox and send it
     else:
-        mail.Send()
-        # Print confirmation on console
-        print('[' + get_timestamp() +
-              "] Sent alert email to admin.")
+        enqueue_message(config, message, "alert email to admin", key)
+        drain_outbox(config)
 
 
 if __name__ == '__main__':
     # Read configuration file
     config = read_configuration_file()
 
-    # Send alert email
-    send_alert_email(config, "q_alert_success",
-                     failed=None, display=True)
+    # Run under profilers if --profile option is given
+    with profiled(config, "qalert"):
+        # Send alert email
+        send_alert_email(config, "q_alert_success",
+                         failed=None, display=True)
+    close_mail_transport()
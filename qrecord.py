@@ -2,176 +2,220 @@
 """Process qualification and practice record."""
 
 # Import libraries
-from common import get_timestamp, read_configuration_file
-from bs4 import BeautifulSoup
+from cache import read_practice_cache, write_practice_cache
+from common import get_timestamp, read_configuration_file, run_worker_pool
+from concurrent.futures import ThreadPoolExecutor
+from metrics import increment, timed
+from profiling import profiled
+from staff import get_staff_directory
+from store import upsert_qualification_record
+from portal import open_portal_session, request_practice_page, \
+    request_qualification_page
+from lxml import html as lxml_html
 from selenium import webdriver
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.by import By
+from io import StringIO
+import asyncio
 import numpy as np
 import pandas as pd
-import glob
-import os
+
+
+# Function to initialise webdriver
+def initialise_webdriver():
+    """Initialise headless webdriver."""
+    options = webdriver.ChromeOptions()
+    options.add_argument("--headless=new")
+
+    return webdriver.Chrome(options=options)
+
+
+# Function to browse qualification page of a staff
+def browse_qualification_page(config, web, staff_id):
+    """Browse qualification page of a staff with webdriver."""
+    # Browse webpage
+    web.get(config["enquiry_qualification_link"])
+
+    # Find input field for staff number
+    staff_id_input = WebDriverWait(web, 10).until(
+            EC.presence_of_element_located((
+                By.XPATH,
+                '//*[@id="ctl00_cphContent_txtEnquiryStaffNo_' +
+                'txtStaffNo"]')))
+
+    # Fill in staff number
+    staff_id_input.send_keys(staff_id)
+
+    # Find "Search" button
+    search_button = WebDriverWait(web, 10).until(
+            EC.presence_of_element_located((
+                By.XPATH,
+                '//*[@id="ctl00_cphContent_btnEnquiry"]')))
+
+    # Click "Search" button
+    search_button.click()
+
+    # Find "Data Download" button
+    WebDriverWait(web, 10).until(
+            EC.presence_of_element_located((
+                By.XPATH,
+                '//*[@id="ctl00_cphContent_btnExport"]')))
+
+    # Return page source
+    return web.page_source
+
+
+# Function to parse qualification page of a staff
+def parse_qualification_record(page_source, staff_id):
+    """Parse qualification page into staff name and record."""
+    document = lxml_html.fromstring(page_source)
+
+    # Find staff name, organisation unit and description
+    name_and_id_string = document.get_element_by_id(
+        "ctl00_cphContent_MtrcMaster_ctl02_dgrdStaff_ctl02_" +
+        "Label8").text_content().strip()
+    name = name_and_id_string.replace(staff_id, "").rstrip()
+    unit = document.get_element_by_id(
+        "ctl00_cphContent_MtrcMaster_ctl02_Label3").text_content()
+    unit_desc = document.get_element_by_id(
+        "ctl00_cphContent_MtrcMaster_ctl02_Label5").text_content()
+
+    # Find text of all entries in data table
+    table = document.get_element_by_id(
+        "ctl00_cphContent_MtrcMaster_ctl02_dgrdStaff_ctl02_" +
+        "dgrdStaffQual")
+    entries = [e.text_content().strip() for e in table.iter("td")]
+
+    # Split entries into complete rows of eight
+    rows = []
+    for i in range(0, len(entries) - 7, 8):
+        text = entries[i]
+
+        # Handle qualification code and qualification
+        if " " in text:
+            text_1 = text.split(" ")[0]
+            text_2 = text.replace(text_1, "").lstrip()
+        else:
+            text_1 = ""
+            text_2 = text
+
+        rows.append([text_1, text_2] + entries[i + 1:i + 8])
+
+    # Build dataframe at once
+    df_record = pd.DataFrame(
+        rows,
+        columns=[
+            "Qualification Code",
+            "Qualification",
+            "First Obtain",
+            "Last Refresh",
+            "Expiry",
+            "Due for Refresh/Examination",
+            "Last Practice/Attachment",
+            "Status",
+            "Note"
+        ],
+        dtype="object"
+    )
+
+    # Add organisation unit and description columns
+    df_record["Organization Unit"] = unit
+    df_record["Organization Unit Desc"] = unit_desc
+
+    return name, df_record
+
+
+# Function to fetch qualification record of a staff
+@timed("tqm_staff_fetch_seconds", record="qualification")
+def fetch_staff_qualification_record(config, client, staff, s, fetch_page):
+    """Fetch qualification record of a staff."""
+    staff_id = s
+
+    # Start trial loop
+    for trial in range(3):
+        try:
+            # Get qualification page with the given engine
+            page_source = fetch_page(config, client, staff_id)
+
+            # Parse staff name and qualification record
+            name, df_record = parse_qualification_record(
+                    page_source, staff_id)
+
+            # Replace qualification record of the staff in record store
+            upsert_qualification_record(config, staff_id, name, df_record)
+
+            # Return success if qualification record is fetched
+            return True
+
+        except BaseException:
+            increment("tqm_fetch_failed_trials_total", record="qualification",
+                      trial=trial + 1)
+
+            print("[" + get_timestamp() +
+                  "] Failed to fetch qualification record for " +
+                  staff.name(s) +
+                  " (Trial #" + str(trial + 1) + ").")
+
+            # Continue trial loop if not last trial
+            continue
+
+    # Return failure if all trials are used up
+    increment("tqm_staff_fetch_failures_total", record="qualification")
+    return False
+
+
+# Function to fetch qualification records with a pool of clients
+def fetch_qualification_record_with_engine(config, staff, staff_list, engine):
+    """Fetch qualification records with the given engine."""
+    # Split the staff list between a pool of HTTP sessions
+    if engine == "http":
+        return run_worker_pool(
+                staff_list, config.get("fetch_workers", 1),
+                lambda: open_portal_session(config),
+                lambda session, s: fetch_staff_qualification_record(
+                    config, session, staff, s, request_qualification_page),
+                lambda session: session.close())
+
+    # Split the staff list between a pool of webdrivers
+    return run_worker_pool(
+            staff_list, config.get("fetch_workers", 1),
+            initialise_webdriver,
+            lambda web, s: fetch_staff_qualification_record(
+                config, web, staff, s, browse_qualification_page),
+            lambda web: web.quit())
 
 
 # Function to fetch qualification record
 def fetch_qualification_record(config):
     """Fetch qualification record."""
     # Read staff list
-    df = pd.read_csv(config["staff_list_path"], dtype="string")
-
-    # Initialise webdriver
-    options = webdriver.ChromeOptions()
-    options.add_argument("--headless=new")
-    web = webdriver.Chrome(options=options)
+    staff = get_staff_directory(config)
+    staff_list = staff.staff_numbers
 
-    # Initialise an array to store all failed cases
-    failed = []
+    # Get fetch engine
+    engine = config.get("fetch_engine", "selenium")
 
     print("[" + get_timestamp() +
           "] Fetching staff qualification record...")
-    # Iterate through all staff
-    for s in df["Staff Number"]:
-        staff_id = s
-
-        # Start trial loop
-        for trial in range(3):
-            try:
-                # Browse webpage
-                web.get(config["enquiry_qualification_link"])
-
-                # Find input field for staff number
-                staff_id_input = WebDriverWait(web, 10).until(
-                        EC.presence_of_element_located((
-                            By.XPATH,
-                            '//*[@id="ctl00_cphContent_txtEnquiryStaffNo_' +
-                            'txtStaffNo"]')))
-
-                # Fill in staff number
-                staff_id_input.send_keys(staff_id)
-
-                # Find "Search" button
-                search_button = WebDriverWait(web, 10).until(
-                        EC.presence_of_element_located((
-                            By.XPATH,
-                            '//*[@id="ctl00_cphContent_btnEnquiry"]')))
-
-                # Click "Search" button
-                search_button.click()
-
-                # Find "Data Download" button
-                WebDriverWait(web, 10).until(
-                        EC.presence_of_element_located((
-                            By.XPATH,
-                            '//*[@id="ctl00_cphContent_btnExport"]')))
-
-                # Get page source
-                page_source = web.page_source
-                soup = BeautifulSoup(page_source, 'lxml')
-
-                # Find staff name, organisation unit and description
-                name_and_id = soup.find(
-                    "span",
-                    id="ctl00_cphContent_MtrcMaster_ctl02_dgrdStaff_ctl02_" +
-                    "Label8")
-                name_and_id_string = name_and_id.text.lstrip().rstrip()
-                name = name_and_id_string.replace(staff_id, "").rstrip()
-                unit = soup.find(
-                    "span",
-                    id="ctl00_cphContent_MtrcMaster_ctl02_Label3").text
-                unit_desc = soup.find(
-                    "span",
-                    id="ctl00_cphContent_MtrcMaster_ctl02_Label5").text
-
-                # Find data table
-                table = soup.find(
-                    "table",
-                    id="ctl00_cphContent_MtrcMaster_ctl02_dgrdStaff_ctl02_" +
-                    "dgrdStaffQual")
-                entries = table.find_all("td")
-
-                # Initialise dataframe
-                df_record = pd.DataFrame(
-                    columns=[
-                        "Qualification Code",
-                        "Qualification",
-                        "First Obtain",
-                        "Last Refresh",
-                        "Expiry",
-                        "Due for Refresh/Examination",
-                        "Last Practice/Attachment",
-                        "Status",
-                        "Note"
-                    ]
-                )
-
-                # Iterate through all entries in the table
-                row = []
-                for i, e in enumerate(entries):
-                    text = e.text.lstrip().rstrip()
-
-                    # Handle qualification code and qualification
-                    if i % 8 == 0:
-                        if " " in text:
-                            # Get qualification code
-                            text_1 = text.split(" ")[0]
-                            row.append(text_1)
-
-                            # Get qualification
-                            text_2 = text.replace(text_1, "").lstrip()
-                            row.append(text_2)
-
-                        else:
-                            row.append("")
-                            row.append(text)
-
-                    else:
-                        # Get date
-                        row.append(text)
-
-                    # Write row to dataframe
-                    if i % 8 == 7:
-                        df_record.loc[i // 8] = row
-                        row.clear()
-
-                # Add organisation unit and description columns
-                df_record["Organization Unit"] = unit
-                df_record["Organization Unit Desc"] = unit_desc
-
-                # Remove previous files
-                try:
-                    for previous_file in glob.glob("temp/Q_" + name + '*'):
-                        os.remove(previous_file)
-                except BaseException:
-                    pass
 
-                # Save dataframe as CSV file
-                file_name = "temp/Q_" + name + "_" + staff_id + "_" + \
-                    get_timestamp(format="%Y%m%d") + ".csv"
-                df_record.to_csv(file_name, index=False, encoding="utf-8-sig")
+    # Fetch qualification records
+    results = fetch_qualification_record_with_engine(
+            config, staff, staff_list, engine)
 
-                # Exit trial loop if qualification record is fetched
-                break
+    # Fall back to webdriver for failed cases of HTTP engine
+    if engine == "http" and not all(results):
+        retry_list = [s for s, r in zip(staff_list, results) if not r]
 
-            except BaseException:
+        print("[" + get_timestamp() + "] Retrying " +
+              str(len(retry_list)) + " failed case(s) with webdriver...")
 
-                print("[" + get_timestamp() +
-                      "] Failed to fetch qualification record for " +
-                      df[df["Staff Number"] == s]["Name"].values[0] +
-                      " (Trial #" + str(trial + 1) + ").")
+        retry_results = iter(fetch_qualification_record_with_engine(
+                config, staff, retry_list, "selenium"))
+        results = [r or next(retry_results) for r in results]
 
-                # Exit trial loop if last trial
-                if trial == 2:
-                    # Append staff number to failed array
-                    failed.append(s)
-
-                    break
-
-                # Continue trial loop if not last trial
-                continue
-
-    # Quit web
-    web.quit()
+    # Initialise an array to store all failed cases in staff list order
+    failed = [s for s, r in zip(staff_list, results) if not r]
 
     print("[" + get_timestamp() +
           "] Completed with " + str(len(failed)) + " failed case(s).")
@@ -180,6 +224,301 @@ def fetch_qualification_record(config):
     return failed
 
 
+# Function to browse practice page of a staff and qualification
+def browse_practice_page(config, web, sid, q_code, since):
+    """Browse CQAS practice page with webdriver."""
+    # Browse webpage
+    web.get(config["enquiry_practice_link"])
+
+    # Find "Clear" button
+    clear_button = WebDriverWait(web, 10).until(
+        EC.presence_of_element_located(
+            (By.XPATH,
+             '//*[@id="ctl00_cphContent_btnClear_' +
+             'Pract"]')))
+
+    # Click "Clear" button
+    clear_button.click()
+
+    # Find input field for staff number
+    WebDriverWait(web, 10).until(
+        EC.presence_of_element_located(
+            (By.XPATH,
+             '//*[@id="ctl00_cphContent_txtSearch' +
+             'Staff_Pract_txtStaffNo"]')))
+
+    # Fill in staff number
+    web.execute_script(
+        "document.getElementById(" +
+        "'ctl00_cphContent_txtSearchStaff_" +
+        "Pract_txtStaffNo'" +
+        ").setAttribute('value', '" +
+        sid + "')")
+
+    # Find "Search" button
+    search_button = WebDriverWait(web, 10).until(
+        EC.presence_of_element_located(
+            (By.XPATH,
+             '//*[@id="ctl00_cphContent_btnSearch_' +
+             'Pract"]')))
+
+    # Click "Search" button
+    search_button.click()
+
+    # Find "Cancel" button
+    cancel_button = WebDriverWait(web, 10).until(
+        EC.presence_of_element_located(
+            (By.XPATH,
+             '//*[@id="ctl00_cphContent_btnBack"]')))
+
+    # Click "Cancel" button
+    cancel_button.click()
+
+    # Find input field for qualification code
+    WebDriverWait(web, 10).until(
+        EC.presence_of_element_located(
+            (By.XPATH,
+             '//*[@id="ctl00_cphContent_txtQual_' +
+             'Pract"]')))
+
+    # Fill in qualification code
+    web.execute_script(
+        "document.getElementById(" +
+        "'ctl00_cphContent_txtQual_Pract'" +
+        ").setAttribute('value', '" +
+        q_code + "')")
+
+    # Find start date input field
+    WebDriverWait(web, 10).until(
+        EC.presence_of_element_located(
+            (By.XPATH,
+             '//*[@id="ctl00_cphContent_' +
+             'txtDateForSearchFrom_dateTextBox"]')))
+
+    # Input start date
+    web.execute_script(
+        "document.getElementById(" +
+        "'ctl00_cphContent_txtDateForSearchFrom_" +
+        "dateTextBox'" +
+        ").setAttribute('value', '" +
+        since + "')")
+
+    # Find "Search" button
+    search_button = WebDriverWait(web, 10).until(
+        EC.presence_of_element_located(
+            (By.XPATH,
+             '//*[@id="ctl00_cphContent_btnSearch_' +
+             'Pract"]')))
+
+    # Click "Search" button
+    search_button.click()
+
+    # Find "Data Download" button
+    WebDriverWait(web, 10).until(
+            EC.presence_of_element_located((
+                By.XPATH,
+                '//*[@id="ctl00_cphContent_' +
+                'btnDownLoad"]')))
+
+    # Get page source
+    page_source = web.page_source
+
+    # Find "Cancel" button
+    cancel_button = WebDriverWait(web, 10).until(
+        EC.presence_of_element_located(
+            (By.XPATH,
+             '//*[@id="ctl00_cphContent_btnBack"]')))
+
+    # Click "Cancel" button
+    cancel_button.click()
+
+    return page_source
+
+
+# Function to parse number of practice records found
+def parse_practice_count(page_source):
+    """Parse number of practice records found."""
+    return lxml_html.fromstring(page_source).get_element_by_id(
+        "ctl00_cphContent_lblRecordCount").text_content().split(
+            ":")[1].strip()
+
+
+# Function to parse all practice records found
+def parse_practice_records(config, page_source):
+    """Parse all practice records found into codes and dates."""
+    # Get column headers of qualification code and practice date
+    code_column, date_column = config.get(
+            "practice_record_columns", ["Qualification", "Practice Date"])
+
+    # Return no records if none is found, where no result table is shown
+    count = int(parse_practice_count(page_source))
+    if count == 0:
+        return pd.DataFrame({
+            "Qualification Code": pd.Series(dtype=object),
+            "Practice Date": pd.Series(dtype="datetime64[ns]")})
+
+    # Return nothing without retrial if result table is not found or
+    # records are shown on multiple pages, so that they are searched by
+    # qualification instead
+    try:
+        df_p = next(t for t in pd.read_html(StringIO(page_source),
+                                            match=code_column,
+                                            flavor="lxml")
+                    if code_column in t.columns and date_column in t.columns)
+
+    except (ValueError, StopIteration):
+        return None
+
+    if len(df_p) != count:
+        return None
+
+    # Keep qualification code and practice date only
+    return pd.DataFrame({
+        "Qualification Code": df_p[code_column].astype(str).str.split(
+            " ").str[0],
+        "Practice Date": pd.to_datetime(
+            df_p[date_column].astype(str).str.split(" ").str[0],
+            format="%d/%m/%Y")})
+
+
+# Function to count practice records of each qualification locally
+def count_practice_records(df_p, q_code, since):
+    """Count practice records of a qualification since a date."""
+    return str(((df_p["Qualification Code"] == q_code) & (
+        df_p["Practice Date"] >= since)).sum())
+
+
+# Function to fetch and parse a practice page with trials
+@timed("tqm_practice_lookup_seconds", engine="sync")
+def fetch_practice_result(config, client, job, name, fetch_page, parse):
+    """Fetch and parse a practice page with trials."""
+    key, sid, q_code, since = job
+
+    # Start trial loop
+    for trial in range(3):
+        try:
+            # Get practice page and parse the result
+            return parse(fetch_page(config, client, sid, q_code, since))
+
+        except BaseException:
+            increment("tqm_fetch_failed_trials_total", record="practice",
+                      trial=trial + 1)
+            print("[" + get_timestamp() +
+                  "] Failed to fetch practice record for " + name +
+                  " (Trial #" + str(trial + 1) + ").")
+
+    # Return nothing if all trials are used up
+    increment("tqm_staff_fetch_failures_total", record="practice")
+    return None
+
+
+# Function to fetch and parse a practice page concurrently
+async def fetch_practice_result_async(config, job, name, parse, sessions,
+                                      retired_sessions, executor):
+    """Fetch and parse a practice page in a worker thread with timeout."""
+    key, sid, q_code, since = job
+    loop = asyncio.get_running_loop()
+
+    # Wait for an idle session, which bounds the concurrency
+    session = await sessions.get()
+
+    try:
+        with timed("tqm_practice_lookup_seconds", engine="async"):
+            # Start trial loop
+            for trial in range(3):
+                try:
+                    # Request practice page within timeout
+                    page_source = await asyncio.wait_for(
+                            loop.run_in_executor(
+                                executor, request_practice_page, config,
+                                session, sid, q_code, since),
+                            config.get("practice_timeout", 60))
+
+                    # Parse the result
+                    return key, parse(page_source)
+
+                except Exception as e:
+                    increment("tqm_fetch_failed_trials_total",
+                              record="practice", trial=trial + 1)
+                    print("[" + get_timestamp() +
+                          "] Failed to fetch practice record for " + name +
+                          " (Trial #" + str(trial + 1) + ").")
+
+                    # Replace session which may still be used by a timed
+                    # out request, closing it once worker threads are shut
+                    # down
+                    if isinstance(e, asyncio.TimeoutError):
+                        retired_sessions.append(session)
+                        session = open_portal_session(config)
+
+            # Return nothing if all trials are used up
+            increment("tqm_staff_fetch_failures_total", record="practice")
+            return key, None
+
+    finally:
+        # Return session to the pool
+        sessions.put_nowait(session)
+
+
+# Function to fetch and parse all practice pages concurrently
+async def fetch_practice_results_async(config, jobs, names, parse):
+    """Fetch and parse all practice pages in one concurrent sweep."""
+    # Limit number of concurrent requests
+    limit = max(1, min(int(config.get("practice_concurrency", 8)),
+                       len(jobs)))
+
+    # Initialise a pool of HTTP sessions
+    sessions = asyncio.Queue()
+    for n in range(limit):
+        sessions.put_nowait(open_portal_session(config))
+
+    # Run blocking requests in worker threads, with spare threads beyond
+    # the session pool so that retrials do not queue behind timed out
+    # requests still running until their HTTP timeouts
+    executor = ThreadPoolExecutor(max_workers=limit + int(
+        config.get("practice_spare_threads", 2 * limit)))
+    retired_sessions = []
+    try:
+        results = await asyncio.gather(*[
+            fetch_practice_result_async(
+                config, j, names[j[1]], parse, sessions, retired_sessions,
+                executor)
+            for j in jobs])
+
+    finally:
+        # Do not wait for timed out requests still running in worker threads
+        executor.shutdown(wait=False)
+
+        # Close all sessions including those replaced after timeout
+        while not sessions.empty():
+            sessions.get_nowait().close()
+        for session in retired_sessions:
+            session.close()
+
+    return dict(results)
+
+
+# Function to fetch and parse practice pages with the configured engine
+def fetch_practice_results(config, jobs, names, parse):
+    """Fetch and parse practice pages of all jobs."""
+    if len(jobs) == 0:
+        return {}
+
+    # Fetch all practice pages concurrently over HTTP
+    if config.get("fetch_engine", "selenium") == "http":
+        return asyncio.run(fetch_practice_results_async(
+            config, jobs, names, parse))
+
+    # Fetch practice pages one by one with webdriver
+    web = initialise_webdriver()
+    results = {j[0]: fetch_practice_result(
+        config, web, j, names[j[1]], browse_practice_page, parse)
+        for j in jobs}
+    web.quit()
+
+    return results
+
+
 # Function for fetching CQAS practice records
 def fetch_practice_record(config, df):
     """Fetch CQAS practice records."""
@@ -187,174 +526,73 @@ def fetch_practice_record(config, df):
     df["Last Refresh_d"] = df["Last Refresh"].combine_first(df["First Obtain"])
 
     # Return the original dataframe if there is no practice to be fetched
-    if df[df["Qualification Code"].isin(config["has_practice"])].empty is True:
+    if df[df["Qualification Code"].isin(config.has_practice)].empty is True:
         pass
 
     else:
-        # Initialise webdriver
-        options = webdriver.ChromeOptions()
-        options.add_argument("--headless=new")
-        web = webdriver.Chrome(options=options)
-
         print("[" + get_timestamp() + "] Fetching staff practice record...")
 
         # Get staff ID list
         df["Staff ID"] = df["Staff ID"].astype(str)
-        staff_id_list = df["Staff ID"].unique()
-
-        # Iterate through all staff
-        for sid in staff_id_list:
-            df_person = df[df["Staff ID"] == sid]
-
-            # Continue the iteration if there is no practice to be fetched
-            if df_person[df_person["Qualification Code"].isin(
-                    config["has_practice"])
-            ].empty is True:
-                continue
-
-            # Iterate through all qualifications
-            for i, row in df_person.iterrows():
-
-                # If there is practice requirement
-                if row["Qualification Code"] in config["has_practice"]:
-
-                    # Start trial loop
-                    for trial in range(3):
-                        try:
-                            # Browse webpage
-                            web.get(config["enquiry_practice_link"])
-
-                            # Find "Clear" button
-                            clear_button = WebDriverWait(web, 10).until(
-                                EC.presence_of_element_located(
-                                    (By.XPATH,
-                                     '//*[@id="ctl00_cphContent_btnClear_' +
-                                     'Pract"]')))
-
-                            # Click "Clear" button
-                            clear_button.click()
-
-                            # Find input field for staff number
-                            WebDriverWait(web, 10).until(
-                                EC.presence_of_element_located(
-                                    (By.XPATH,
-                                     '//*[@id="ctl00_cphContent_txtSearch' +
-                                     'Staff_Pract_txtStaffNo"]')))
-
-                            # Fill in staff number
-                            web.execute_script(
-                                "document.getElementById(" +
-                                "'ctl00_cphContent_txtSearchStaff_" +
-                                "Pract_txtStaffNo'" +
-                                ").setAttribute('value', '" +
-                                sid + "')")
-
-                            # Find "Search" button
-                            search_button = WebDriverWait(web, 10).until(
-                                EC.presence_of_element_located(
-                                    (By.XPATH,
-                                     '//*[@id="ctl00_cphContent_btnSearch_' +
-                                     'Pract"]')))
-
-                            # Click "Search" button
-                            search_button.click()
-
-                            # Find "Cancel" button
-                            cancel_button = WebDriverWait(web, 10).until(
-                                EC.presence_of_element_located(
-                                    (By.XPATH,
-                                     '//*[@id="ctl00_cphContent_btnBack"]')))
-
-                            # Click "Cancel" button
-                            cancel_button.click()
-
-                            # Find input field for qualification code
-                            WebDriverWait(web, 10).until(
-                                EC.presence_of_element_located(
-                                    (By.XPATH,
-                                     '//*[@id="ctl00_cphContent_txtQual_' +
-                                     'Pract"]')))
-
-                            # Fill in qualification code
-                            web.execute_script(
-                                "document.getElementById(" +
-                                "'ctl00_cphContent_txtQual_Pract'" +
-                                ").setAttribute('value', '" +
-                                row["Qualification Code"] + "')")
-
-                            # Find start date input field
-                            WebDriverWait(web, 10).until(
-                                EC.presence_of_element_located(
-                                    (By.XPATH,
-                                     '//*[@id="ctl00_cphContent_' +
-                                     'txtDateForSearchFrom_dateTextBox"]')))
-
-                            # Input start date
-                            web.execute_script(
-                                "document.getElementById(" +
-                                "'ctl00_cphContent_txtDateForSearchFrom_" +
-                                "dateTextBox'" +
-                                ").setAttribute('value', '" +
-                                row["Last Refresh_d"] + "')")
-
-                            # Find "Search" button
-                            search_button = WebDriverWait(web, 10).until(
-                                EC.presence_of_element_located(
-                                    (By.XPATH,
-                                     '//*[@id="ctl00_cphContent_btnSearch_' +
-                                     'Pract"]')))
-
-                            # Click "Search" button
-                            search_button.click()
-
-                            # Find "Data Download" button
-                            WebDriverWait(web, 10).until(
-                                    EC.presence_of_element_located((
-                                        By.XPATH,
-                                        '//*[@id="ctl00_cphContent_' +
-                                        'btnDownLoad"]')))
-
-                            # Get page source
-                            page_source = web.page_source
-                            soup = BeautifulSoup(page_source, 'lxml')
-
-                            # Find number of record found
-                            df.at[i, "Last Practice/Attachment"] = soup.find(
-                                "span", id="ctl00_cphContent_lblRecordCount"
-                            ).text.split(":")[1]
-
-                            # Find "Cancel" button
-                            cancel_button = WebDriverWait(web, 10).until(
-                                EC.presence_of_element_located(
-                                    (By.XPATH,
-                                     '//*[@id="ctl00_cphContent_btnBack"]')))
-
-                            # Click "Cancel" button
-                            cancel_button.click()
-
-                            # Exit trial loop if practice record is fetched
-                            break
-
-                        except BaseException:
-                            print("[" + get_timestamp() +
-                                  "] Failed to fetch practice record for " +
-                                  df[df["Staff ID"] == sid][
-                                      "Name"].values[0] +
-                                  " (Trial #" + str(trial + 1) + ").")
-
-                            # Exit trial loop if last trial
-                            if trial == 2:
-                                df.at[i, "Last Practice/Attachment"] = '?'
-                                break
-
-                            # Continue trial loop if not last trial
-                            continue
 
+        # List all qualifications with practice requirement
+        df_practice = df[df["Qualification Code"].isin(config.has_practice)]
+        tasks = list(zip(df_practice.index, df_practice["Staff ID"],
+                         df_practice["Qualification Code"],
+                         df_practice["Last Refresh_d"]))
+        tasks_all = tasks
+
+        # Map staff ID to name for messages
+        names = dict(zip(df["Staff ID"], df["Name"]))
+
+        # Read practice records fetched earlier today from cache
+        cached = read_practice_cache(config, [t[1:] for t in tasks])
+        counts = {t[0]: cached[t[1:]] for t in tasks if t[1:] in cached}
+        tasks = [t for t in tasks if t[1:] not in cached]
+
+        # Search all practice records of each staff at once
+        if config.get("practice_query_mode", "qualification") == "staff":
+            # Find earliest date of each staff
+            since_d = pd.to_datetime(pd.Series(
+                [t[3] for t in tasks], dtype="object"), format="%d/%m/%Y",
+                errors="coerce")
+            earliest = since_d.groupby([t[1] for t in tasks]).min().dropna()
+            jobs = [(sid, sid, "", d.strftime("%d/%m/%Y"))
+                    for sid, d in earliest.items()]
+
+            # Fetch all practice records of each staff
+            results = fetch_practice_results(
+                    config, jobs, names,
+                    lambda page: parse_practice_records(config, page))
+
+            # Count practice records of each qualification locally
+            retry_tasks = []
+            for t, d in zip(tasks, since_d):
+                if results.get(t[1]) is None or pd.isnull(d):
+                    retry_tasks.append(t)
                 else:
-                    pass
+                    counts[t[0]] = count_practice_records(
+                            results[t[1]], t[2], d)
+
+            # Fall back to one search per qualification for failed cases
+            tasks = retry_tasks
+
+        # Search practice records of each qualification
+        results = fetch_practice_results(
+                config, tasks, names, parse_practice_count)
+
+        # Mark as unknown if all trials are used up
+        for i, count in results.items():
+            counts[i] = '?' if count is None else count
+
+        # Write fetched practice records to cache
+        write_practice_cache(config, {
+            t[1:]: counts[t[0]] for t in tasks_all
+            if t[1:] not in cached and counts.get(t[0], '?') != '?'})
 
-        # Quit web
-        web.quit()
+        # Fill in number of practice records
+        for i, count in counts.items():
+            df.at[i, "Last Practice/Attachment"] = count
 
         print("[" + get_timestamp() + "] Completed.")
 
@@ -376,5 +614,7 @@ if __name__ == "__main__":
     # Read configuration file
     config = read_configuration_file()
 
-    # Fetch qualification record
-    fetch_qualification_record(config)
+    # Run under profilers if --profile option is given
+    with profiled(config, "qrecord"):
+        # Fetch qualification record
+        fetch_qualification_record(config)
@@ -2,25 +2,22 @@
 """Send reminder email to staff."""
 
 # Import libraries
+from cache import report_practice_cache
 from common import get_timestamp, read_configuration_file
+from mail import build_message, close_mail_transport, get_mail_transport
+from outbox import drain_outbox, enqueue_message, read_pending_email_keys
+from profiling import profiled
 from qrecord import fetch_practice_record
 from qreport import analyse_report
-import win32com.client
+from render import render_table, render_template
+from staff import get_staff_directory
+from store import get_email_key
 import numpy as np
-import pandas as pd
-import os
 
 
-# Function for building reminder content
-def build_reminder_content(config, mode, df):
-    """Process email content for daily reminder."""
-    # Load reminder email template
-    with open("template/q_reminder_" + mode + ".html", "r") as file:
-        reminder_html = file.read()
-
-    # Fetch practice records
-    df = fetch_practice_record(config, df)
-
+# Function for building reminder table
+def build_reminder_table(config, mode, df):
+    """Render reminder table with practice records in HTML."""
     # Drop uneccessary columns
     df.drop(["Staff ID", "Qualification Code", "Status", "Note",
              "Organization Unit", "Organization Unit Desc", "Expiry_d",
@@ -31,69 +28,27 @@ def build_reminder_content(config, mode, df):
     if mode == "daily":
         df.drop("Name", axis=1, inplace=True)
 
-    # Change expiry date column to red in colour
-    df = df.style.set_properties(
-            **{"color": "red"}, subset=["Expiry"]).hide(
-                    axis='index')
+    # Make expiry date and practice count in config red in colour
+    styles = {"Expiry": lambda v: True,
+              "Practice Done": lambda v: v in config.practice_red}
 
-    # Convert dataframe to HTML table
-    email_table = df.to_html(
-            index=False, justify="center").replace(
-                    '<td', '<td align="center"').replace(
-                            '<table',
-                            '<table border="1" class="dataframe"' +
-                            'style="font-family: Courier New" cellpadding=24')
-
-    # Make remaining days red in colour
+    # Make remaining days in config red in colour
     if mode == "daily":
-        for rdr in config["remaining_days_red"]:
-            try:
-                email_table = email_table.replace(
-                        'col5" >' + str(rdr) + '<',
-                        'col5" style="color:red;">' + str(rdr) + '<')
-
-            except BaseException:
-                pass
-
-    # Make practice count red in colour
-    col_num = {"daily": '4', "quarterly": '5'}
-    for pr in config["practice_red"]:
-        try:
-            email_table = email_table.replace(
-                    'col' + col_num[mode] + '" >' + str(pr) + '<',
-                    'col' + col_num[mode] + '" style="color:red;">' + str(
-                        pr) + '<')
-
-        except BaseException:
-            pass
-
-    # Open Outlook application
-    outlook = win32com.client.Dispatch('outlook.application')
-
-    # Create new email
-    mail = outlook.CreateItem(0)
+        styles["Days Remaining"] = lambda v: v in config.remaining_days_red
 
-    # Insert corporate logo in email
-    attachment = mail.Attachments.Add(
-            os.path.abspath(config["email_sender"]["corp_logo"]))
-    attachment.PropertyAccessor.SetProperty(
-            "http://schemas.microsoft.com/mapi/proptag/0x3712001F", "logo")
-
-    # Compose email body content
-    content = reminder_html
-
-    # Replace reminder table in email
-    content = content.replace("{{ email_table }}", email_table)
+    # Convert dataframe to HTML table
+    return render_table(df, styles=styles)
 
-    # Replace sender's details placeholders in email
-    for key, value in config["email_sender"].items():
-        try:
-            content = content.replace("{{ " + key + " }}", value)
 
-        except BaseException:
-            pass
+# Function for building reminder content
+def build_reminder_content(config, mode, df):
+    """Process email table for reminder."""
+    # Fetch practice records
+    df = fetch_practice_record(config, df)
 
-    return mail, content
+    # Convert dataframe to HTML table
+    email_table = build_reminder_table(config, mode, df)
+    return email_table
 
 
 # Function for sending daily reminder email to staff
@@ -108,8 +63,11 @@ def send_daily_reminder_email(config, display=False, test_date=None):
               "] No staff requires qualification reminder email.")
         return
 
-    # Read staff list
-    df_staff = pd.read_csv(config["staff_list_path"], dtype="string")
+    # Get staff directory
+    staff = get_staff_directory(config)
+
+    # Get keys of emails sent today or waiting in outbox
+    pending = read_pending_email_keys(config)
 
     # Get list of all staff recieving the email
     staff_list = df_reminder["Staff ID"].unique()
@@ -118,20 +76,27 @@ def send_daily_reminder_email(config, display=False, test_date=None):
         # Filter by staff ID
         df_email = df_reminder[df_reminder["Staff ID"] == s]
 
+        # Receiver's email
+        receipient_email = staff.email(str(s))
+
+        # Skip email which has been sent today
+        key = get_email_key(receipient_email, "q_reminder_daily", df_email)
+        if not display and key in pending:
+            print('[' + get_timestamp() +
+                  "] Skipped qualification reminder email to " +
+                  staff.name(str(s)) + " as it has been sent today.")
+            continue
+
         # Build reminder content
-        mail, content = build_reminder_content(config, "daily", df_email)
+        email_table = build_reminder_content(config, "daily", df_email)
 
         # Get staff name for email
-        staff_email_name = df_staff.loc[
-                df_staff["Staff Number"] == str(s), "Email Name"].item()
+        staff_email_name = staff.email_name(str(s))
 
-        # Replace staff name placeholder in email
-        content = content.replace("{{ staff_name }}", staff_email_name)
-
-        # Receiver's email
-        receipient_email = df_staff.loc[
-            df_staff["Staff Number"] == str(s), "Corporate Email"].item()
-        mail.To = receipient_email
+        # Render reminder email template
+        content = render_template(config, "q_reminder_daily",
+                                  email_table=email_table,
+                                  staff_name=staff_email_name)
 
         # Send email copy
         cc_list = []
@@ -140,9 +105,7 @@ def send_daily_reminder_email(config, display=False, test_date=None):
 
         # Get team admin list if any qualification is expiring within 30 days
         if (df_email["Days Remaining"] <= 30).any():
-            g = df_staff.loc[df_staff["Staff Number"] == str(s), "Team"].item()
-            team_admin_list = df_staff.loc[df_staff["Staff Number"].isin(
-                config["team_admin"][g])]["Corporate Email"].tolist()
+            team_admin_list = staff.team_admin_emails(staff.team(str(s)))
 
             # Remove admin email from team admin list
             if config["email_sender"]["admin_email"] in team_admin_list:
@@ -164,35 +127,31 @@ def send_daily_reminder_email(config, display=False, test_date=None):
         if receipient_email in cc_list:
             cc_list.remove(receipient_email)
 
-        # Set CC
-        mail.CC = "; ".join(cc_list)
-
-        # Email subject
-        mail.Subject = "Reminder of Qualification Renewal on " + \
-            get_timestamp(format="%d/%m/%Y")
-
-        # Email body content in HTML
-        mail.HTMLBody = content
+        # Email with subject
+        message = build_message(
+                [receipient_email], cc_list,
+                "Reminder of Qualification Renewal on " +
+                get_timestamp(format="%d/%m/%Y"), content)
 
         # Display email for inspection
         if display:
-            mail.Display()
+            get_mail_transport(config).send(message, display=True)
 
             # Print confirmation on console
             print('[' + get_timestamp() +
                   "] Prepared qualification reminder email sending to " +
-                  df_staff.loc[df_staff["Staff Number"] == str(s),
-                               "Name"].item() + '.')
+                  staff.name(str(s)) + '.')
 
-        # Send email
+        # Queue email in outbox
         else:
-            mail.Send()
+            enqueue_message(config, message,
+                            "qualification reminder email to " +
+                            staff.name(str(s)), key)
+            pending.add(key)
 
-            # Print confirmation on console
-            print('[' + get_timestamp() +
-                  "] Sent qualification reminder email to " +
-                  df_staff.loc[df_staff["Staff Number"] == str(s),
-                               "Name"].item() + '.')
+    # Send queued emails
+    if not display:
+        drain_outbox(config)
 
 
 # Function for sending quarterly reminder to team head
@@ -217,15 +176,17 @@ def send_quarterly_reminder_email(
               "] No team requires qualification reminder email.")
         return
 
-    # Read staff list
-    df_staff = pd.read_csv(config["staff_list_path"], dtype="string")
+    # Get staff directory
+    staff = get_staff_directory(config)
+
+    # Get keys of emails sent today or waiting in outbox
+    pending = read_pending_email_keys(config)
 
     # Iterate through all teams
     for g in config["team_admin"]:
 
         # Get team member list
-        df_team = df_staff[df_staff["Team"] == g]
-        member_list = df_team["Staff Number"].tolist()
+        member_list = staff.team_members(g)
 
         # Filter by staff number in member list
         df_email = df_reminder[df_reminder["Staff ID"].astype(str).isin(
@@ -234,67 +195,65 @@ def send_quarterly_reminder_email(
         if df_email.empty:
             continue
 
+        # Get team admin email
+        team_admin_email = staff.team_admin_emails(g)
+
+        # Skip email which has been sent today
+        key = get_email_key("; ".join(team_admin_email),
+                            "q_reminder_quarterly", df_email)
+        if not display and key in pending:
+            print('[' + get_timestamp() +
+                  "] Skipped qualification reminder email to team " + g +
+                  " as it has been sent today.")
+            continue
+
         # Build reminder content
-        mail, content = build_reminder_content(config, "quarterly",
-                                               df_email)
+        email_table = build_reminder_content(config, "quarterly", df_email)
 
         # Get team admin list
-        team_admin_list = df_staff.loc[df_staff["Staff Number"].isin(
-            config["team_admin"][g])]["Email Name"].tolist()
+        team_admin_list = staff.team_admin_email_names(g)
 
         if len(team_admin_list) <= 2:
             team_admin_name = " and ".join(team_admin_list)
         else:
             team_admin_name = "all"
 
-        # Replace staff name placeholder in email
-        content = content.replace("{{ team_admin_name }}", team_admin_name)
-
-        # Replace year placeholder in email
-        content = content.replace("{{ year }}", year)
-
-        # Replace quarter placeholder in email
-        content = content.replace("{{ quarter }}", q_num)
-
-        # Replace team placeholder in email
-        content = content.replace("{{ team }}", g)
-
-        # Get team admin email
-        team_admin_email = df_staff.loc[df_staff["Staff Number"].isin(
-            config["team_admin"][g])]["Corporate Email"].tolist()
-
-        # Receiver's email
-        mail.To = "; ".join(team_admin_email)
+        # Render reminder email template
+        content = render_template(config, "q_reminder_quarterly",
+                                  email_table=email_table,
+                                  team_admin_name=team_admin_name,
+                                  year=year, quarter=q_num, team=g)
 
         # Send email copy
         cc_list = []
         for cc in config["email_cc"]:
             cc_list.append(cc)
-        mail.CC = "; ".join(cc_list)
-
-        # Email subject
-        mail.Subject = "Quarterly Reminder of Qualification Renewal in " +\
-            year + " Q" + q_num
 
-        # Email body content in HTML
-        mail.HTMLBody = content
+        # Email to team admin with subject
+        message = build_message(
+                team_admin_email, cc_list,
+                "Quarterly Reminder of Qualification Renewal in " +
+                year + " Q" + q_num, content)
 
         # Display email for inspection
         if display:
-            mail.Display()
+            get_mail_transport(config).send(message, display=True)
 
             # Print confirmation on console
             print('[' + get_timestamp() +
                   "] Prepared qualification reminder email to team " +
                   g + '.')
 
-        # Send email
+        # Queue email in outbox
         else:
-            mail.Send()
+            enqueue_message(config, message,
+                            "qualification reminder email to team " + g,
+                            key)
+            pending.add(key)
 
-            # Print confirmation on console
-            print('[' + get_timestamp() +
-                  "] Sent qualification reminder email to team " + g + '.')
+    # Send queued emails
+    if not display:
+        drain_outbox(config)
 
 
 if __name__ == "__main__":
@@ -303,14 +262,22 @@ if __name__ == "__main__":
 
     test_mode = "daily"
 
-    if test_mode == "daily":
-        # Generate reminder email
-        send_daily_reminder_email(config, display=True, test_date=None)
+    # Run under profilers if --profile option is given
+    with profiled(config, "qreminder"):
+        if test_mode == "daily":
+            # Generate reminder email
+            send_daily_reminder_email(config, display=True, test_date=None)
+
+        elif test_mode == "quarterly":
+            # Generate quarterly reminder email
+            send_quarterly_reminder_email(config, "1", "2025-01", "2025-04",
+                                          display=True, test_date=None)
+
+        else:
+            pass
 
-    elif test_mode == "quarterly":
-        # Generate quarterly reminder email
-        send_quarterly_reminder_email(config, "1", "2025-01",
-                                      "2025-04", display=True, test_date=None)
+    # Close mail transport
+    close_mail_transport()
 
-    else:
-        pass
+    # Report practice cache hit and miss counts
+    report_practice_cache()
@@ -3,66 +3,46 @@
 
 # Import libraries
 from common import get_timestamp, read_configuration_file
+from metrics import timed
+from profiling import profiled
+from staff import get_staff_directory
+from store import read_qualification_records
 import pandas as pd
 import numpy as np
-import glob
 
 # Configure Pandas
 pd.set_option('mode.chained_assignment', None)
 
 
-# Function for generating report in CSV format
-def generate_qualification_report(config):
-    """Generate report in CSV format."""
-    # Initialise dataframe for all data
-    df_all = pd.DataFrame([])
-
-    # Read staff list
-    df_staff = pd.read_csv(config["staff_list_path"], dtype="string")
-
-    # Read individual reports
-    files = glob.glob("temp/Q_*.csv")
-    for f in files:
-        # Filter away former staff
-        sid = f.split('\\')[1].split("_")[2]
-        if sid not in df_staff["Staff Number"].values:
-            continue
-
-        # Import report as dataframe
-        df = pd.read_csv(f)
+# Function to mark implied qualification
+def mark_implied_qualification(config, df_all):
+    """Mark implied qualification of all staff."""
+    # Find group and rank of all qualifications held
+    df_rank = df_all[["Staff ID", "Qualification Code"]].reset_index().merge(
+        config.implied_rank_table, on="Qualification Code")
 
-        # Set Note column as string
-        df["Note"] = df["Note"].astype(str)
+    # Mark all qualifications below the highest-ranked one held in group
+    top_rank = df_rank.groupby(["Staff ID", "iq_group"])[
+        "iq_rank"].transform("min")
+    df_all.loc[df_rank.loc[df_rank["iq_rank"] > top_rank, "index"].unique(),
+               "Note"] = "Implied"
 
-        # Insert staff number in dataframe
-        df.insert(0, "Staff ID", sid)
-        df.insert(1, "Name", f.split('\\')[1].split("_")[1])
-
-        # Mark implied qualification
-        for iq in config["implied_qualification"]:
-            if df["Qualification Code"].str.contains(
-                    "|".join(iq)).values.sum() >= 2:
-                im_flag = False
-                for i, iqq in enumerate(iq):
-                    if (not im_flag) and (
-                            iqq in df["Qualification Code"].values):
-                        im_flag = True
-
-                    elif iqq in df["Qualification Code"].values:
-                        df.loc[df["Qualification Code"] == iqq,
-                               "Note"] = "Implied"
+    return df_all
 
-                    else:
-                        pass
 
-            else:
-                pass
+# Function for generating report in CSV format
+@timed("tqm_report_build_seconds", report="qualification")
+def generate_qualification_report(config):
+    """Generate report in CSV format."""
+    # Read qualification records of current staff from record store
+    df_all = read_qualification_records(
+            config, get_staff_directory(config).staff_numbers)
 
-        # Replace "nan" with empty string
-        df["Note"] = df["Note"].replace("nan", '')
+    # Mark implied qualification
+    df_all = mark_implied_qualification(config, df_all)
 
-        # Append data to main dataframe
-        df_all = pd.concat([df_all, df], ignore_index=True)
+    # Replace missing note with empty string
+    df_all["Note"] = df_all["Note"].fillna('')
 
     # Export report as CSV file in local folder
     df_all.to_csv(config["q_report_path"], index=False, encoding='utf-8-sig')
@@ -83,7 +63,41 @@ def generate_qualification_report(config):
     return df_all
 
 
+# Function for building trigger table of remaining days
+def build_trigger_table(config, q_code_list):
+    """Add default remaining days of other codes to the trigger table."""
+    q_code_list = pd.Series(q_code_list, name="Qualification Code")
+
+    # Codes not in remaining days table follow the default
+    df_default = q_code_list[~q_code_list.isin(
+        config.trigger_table["Qualification Code"])].to_frame().merge(
+            config.default_trigger_table, how="cross")
+
+    return pd.concat([config.trigger_table, df_default], ignore_index=True)
+
+
+# Function for marking refresher training
+def mark_refresher_training(config, df_reminder):
+    """Mark if refresher training is required as Y, N or '-'."""
+    # Get repeat year of each qualification
+    repeat_year = df_reminder["Qualification Code"].map(
+        config.refresher_map)
+
+    # Calculate if refresher training is required
+    training_array = (df_reminder["Expiry_d"].dt.year - df_reminder[
+        "First Obtain_d"].dt.year) % repeat_year
+
+    # Indicate if refresher training is required
+    df_reminder["Refresher"] = pd.Series(
+        np.where(training_array.isna(), '-',
+                 np.where(training_array == 0, 'Y', 'N')),
+        index=df_reminder.index, dtype="string")
+
+    return df_reminder
+
+
 # Function for analysing report
+@timed("tqm_analysis_seconds", analysis="qualification")
 def analyse_report(config, quarter_range=None, test_date=None):
     """Analyse report."""
     # Get date for testing
@@ -93,9 +107,6 @@ def analyse_report(config, quarter_range=None, test_date=None):
     else:
         today = np.datetime64("today", 'D')
 
-    # Initialise dataframe for reminder
-    df_reminder = pd.DataFrame([])
-
     # Read report
     df = pd.read_csv(config["q_report_path"])
 
@@ -103,54 +114,41 @@ def analyse_report(config, quarter_range=None, test_date=None):
     df["Expiry"] = df["Expiry"].combine_first(
         df["Due for Refresh/Examination"])
 
-    # Get list of available qualifications
-    q_code_list = df["Qualification Code"].unique()
-
-    for q in q_code_list:
-        # Filter by qualification
-        df_q = df[df["Qualification Code"] == q]
-
-        # Skip if there is no expiry date or the qualification is bypassed
-        if df_q["Expiry"].isnull().all() \
-                or q in config["bypass_qualification"]:
-            continue
-
-        # If the qualification has an expiry date
-        else:
-            # Remove all rows without an expiry date
-            df_qe = df_q[df_q["Expiry"].notnull()]
-
-            # Change data type of expiry dates
-            df_qe["Expiry_d"] = pd.to_datetime(
-                df_qe["Expiry"], format="%d/%m/%Y")
-
-            # Change data type of first obtain date
-            df_qe["First Obtain_d"] = pd.to_datetime(
-                df_qe["First Obtain"], format="%d/%m/%Y")
-
-            # No need to check for remaining days for quarterly report
-            if quarter_range is not None:
-                df_qe = df_qe[df_qe["Expiry_d"].astype(
-                    str).isin(quarter_range)]
-                df_reminder = pd.concat([df_reminder, df_qe],
-                                        ignore_index=True)
-                continue
-
-            # Get the number of day(s) between today and expiry date
-            df_qe["Days Remaining"] = df_qe["Expiry_d"] - today
-
-            # Change data type of remaining days
-            df_qe["Days Remaining"] = df_qe["Days Remaining"].dt.days
-
-            # Append data to reminder dataframe according to table in config
-            if q in config["remaining_days_table"]:
-                for r in config["remaining_days_table"][q]:
-                    df_reminder = pd.concat([df_reminder, df_qe[df_qe[
-                        "Days Remaining"] == r]], ignore_index=True)
-            else:
-                for r in config["remaining_days_table"]["DEFAULT"]:
-                    df_reminder = pd.concat([df_reminder, df_qe[df_qe[
-                        "Days Remaining"] == r]], ignore_index=True)
+    # Keep qualification order of the whole report
+    df["q_order"] = pd.factorize(df["Qualification Code"])[0]
+
+    # Remove rows without an expiry date or of bypassed qualification
+    df_qe = df[df["Expiry"].notnull() & df["Qualification Code"].notnull() & (
+        ~df["Qualification Code"].isin(config.bypass_qualification))]
+
+    # Change data type of expiry and first obtain dates for whole report
+    df_qe["Expiry_d"] = pd.to_datetime(df_qe["Expiry"], format="%d/%m/%Y")
+    df_qe["First Obtain_d"] = pd.to_datetime(
+        df_qe["First Obtain"], format="%d/%m/%Y")
+
+    # Keep row order of the report
+    df_qe["row_order"] = np.arange(len(df_qe))
+
+    # No need to check for remaining days for quarterly report
+    if quarter_range is not None:
+        df_reminder = df_qe[df_qe["Expiry_d"].astype(str).isin(quarter_range)]
+        df_reminder = df_reminder.sort_values(["q_order", "row_order"])
+
+    else:
+        # Get the number of day(s) between today and expiry date
+        df_qe["Days Remaining"] = (df_qe["Expiry_d"] - today).dt.days
+
+        # Select rows matching the remaining days table in config at once
+        df_reminder = df_qe.merge(
+            build_trigger_table(
+                config, df_qe["Qualification Code"].unique()),
+            on=["Qualification Code", "Days Remaining"])
+        df_reminder = df_reminder.sort_values(
+            ["q_order", "r_order", "row_order"]).drop(columns="r_order")
+
+    # Drop helper columns
+    df_reminder = df_reminder.drop(
+        columns=["q_order", "row_order"]).reset_index(drop=True)
 
     # Add column for refresher
     if df_reminder.empty is False:
@@ -163,41 +161,7 @@ def analyse_report(config, quarter_range=None, test_date=None):
                      inplace=True)
 
     # Check if refresher training is required for all staff
-    for s in df_reminder["Staff ID"].unique():
-        df_reminder_s = df_reminder[
-                df_reminder["Staff ID"] == s].convert_dtypes()
-
-        for t in config["has_refresher"]:
-            has_refresher_q = t[0:-1]
-            repeat_year = t[-1]
-
-            for q in has_refresher_q:
-                if df_reminder_s[
-                        df_reminder_s["Qualification Code"] == q].empty:
-                    continue
-
-                else:
-                    df_refresher = df_reminder_s[df_reminder_s[
-                        "Qualification Code"] == q]
-
-                    # Calculate if refresher training is required
-                    training_array = (pd.DatetimeIndex(
-                        df_refresher["Expiry_d"]).year - pd.DatetimeIndex(
-                            df_refresher["First Obtain_d"]).year) % repeat_year
-
-                    df_refresher["Refresher"] = training_array
-
-                    # Update results to reminder dataframe
-                    df_reminder.update(df_refresher)
-
-    # Change data type of refresher training column
-    df_reminder["Refresher"] = df_reminder["Refresher"].astype("string")
-
-    # Indicate if refresher training is required
-    df_reminder["Refresher"] = df_reminder["Refresher"].replace(np.nan, '-')
-    df_reminder["Refresher"] = df_reminder["Refresher"].replace("0.0", 'Y')
-    df_reminder["Refresher"] = df_reminder["Refresher"].replace(
-            r'\d+.\d+', 'N', regex=True)
+    df_reminder = mark_refresher_training(config, df_reminder)
 
     if quarter_range is None:
         # Change remaining days to integers
@@ -222,8 +186,10 @@ if __name__ == "__main__":
     # Read configuration file
     config = read_configuration_file()
 
-    # Generate report
-    generate_qualification_report(config)
+    # Run under profilers if --profile option is given
+    with profiled(config, "qreport"):
+        # Generate report
+        generate_qualification_report(config)
 
-    # Analyse report
-    print(analyse_report(config, quarter_range=None, test_date=None))
+        # Analyse report
+        print(analyse_report(config, quarter_range=None, test_date=None))
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""Render email templates and tables."""
+
+# Import libraries
+from common import get_timestamp, read_configuration_file
+from html import escape
+from jinja2 import Environment, FileSystemLoader
+import pandas as pd
+import threading
+
+# Initialise template environment shared by all modules in this process
+template_environment = None
+template_environment_lock = threading.Lock()
+
+
+# Function to get template environment
+def get_template_environment(config):
+    """Get template environment with sender's details bound once."""
+    global template_environment
+
+    with template_environment_lock:
+        # Create environment again only if sender's details have changed
+        if template_environment is None or \
+                template_environment.email_sender != config["email_sender"]:
+            environment = Environment(
+                    loader=FileSystemLoader("template"), autoescape=False,
+                    keep_trailing_newline=True)
+
+            # Bind sender's details as globals of all templates
+            environment.globals.update(config["email_sender"])
+            environment.email_sender = dict(config["email_sender"])
+
+            template_environment = environment
+
+        return template_environment
+
+
+# Function to render an email template
+def render_template(config, name, **context):
+    """Render an email template compiled once per process."""
+    return get_template_environment(config).get_template(
+            name + ".html").render(**context)
+
+
+# Function to render a dataframe as an HTML table
+def render_table(df, headers=None, styles=None, na_rep=None):
+    """Render dataframe as HTML table with cells styled by column rules."""
+    headers = headers or {}
+    styles = styles or {}
+
+    # Find styling rule of each column
+    rules = [styles.get(c) for c in df.columns]
+
+    # Render table header with renamed columns
+    lines = ['<table border="1" class="dataframe" ' +
+             'style="font-family: Courier New" cellpadding=24>',
+             '  <thead>',
+             '    <tr style="text-align: center;">']
+    lines += ['      <th>' + headers.get(c, escape(str(c))) + '</th>'
+              for c in df.columns]
+    lines += ['    </tr>', '  </thead>', '  <tbody>']
+
+    # Render table body with cells red in colour if their rule holds, where
+    # missing values are shown as text of value unless na_rep is given
+    for row in df.itertuples(index=False, name=None):
+        lines.append('    <tr>')
+        for value, rule in zip(row, rules):
+            text = na_rep if na_rep is not None and pd.isna(value) else \
+                str(value)
+            style = ' style="color:red;"' if rule is not None and rule(
+                text) else ''
+            lines.append('      <td align="center"' + style + '>' +
+                         escape(text, quote=False) + '</td>')
+        lines.append('    </tr>')
+
+    lines += ['  </tbody>', '</table>']
+
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    # Read configuration file
+    config = read_configuration_file()
+
+    # Compile all email templates
+    environment = get_template_environment(config)
+    for name in environment.list_templates(extensions=["html"]):
+        environment.get_template(name)
+
+    print("[" + get_timestamp() + "] Compiled " +
+          str(len(environment.list_templates(extensions=["html"]))) +
+          " email template(s).")
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""Look up staff details from the staff list."""
+
+# Import libraries
+from common import get_timestamp, handle_error_message, \
+    read_configuration_file
+import pandas as pd
+import os
+import threading
+
+# Initialise staff directory shared by all modules in this process
+staff_directory = None
+staff_directory_lock = threading.Lock()
+
+
+# Class of staff list indexed by staff number
+class StaffDirectory:
+    """Staff list indexed by staff number."""
+
+    def __init__(self, config):
+        """Read staff list and build lookup tables."""
+        self.path = config["staff_list_path"]
+        self.mtime = os.path.getmtime(self.path)
+        self.team_admin = config["team_admin"]
+
+        # Read staff list
+        self.df = pd.read_csv(self.path, dtype="string")
+
+        # Keep first row of each staff number listed more than once
+        duplicated = self.df["Staff Number"].duplicated()
+        if duplicated.any():
+            handle_error_message(
+                    "Skipped duplicate staff number(s) in staff list: " +
+                    ", ".join(self.df.loc[duplicated, "Staff Number"].astype(
+                        str).unique()) + '.')
+            self.df = self.df[~duplicated].reset_index(drop=True)
+        self.staff_numbers = self.df["Staff Number"].tolist()
+
+        # Index staff details by staff number
+        self.records = self.df.set_index(
+                "Staff Number", drop=False).to_dict("index")
+
+        # Index team members by team
+        self.members = {}
+        for s, g in zip(self.df["Staff Number"], self.df["Team"]):
+            self.members.setdefault(g, []).append(s)
+
+        # Index team admins by team in staff list order
+        self.admins = {}
+        for g, admin_list in self.team_admin.items():
+            admin_set = set(admin_list)
+            self.admins[g] = [s for s in self.staff_numbers
+                              if s in admin_set]
+
+    def __contains__(self, s):
+        """Check if staff number is in staff list."""
+        return s in self.records
+
+    def __len__(self):
+        """Get number of staff."""
+        return len(self.staff_numbers)
+
+    def is_outdated(self, config):
+        """Check if staff list or team admin has changed."""
+        return self.path != config["staff_list_path"] \
+            or self.mtime != os.path.getmtime(self.path) \
+            or self.team_admin != config["team_admin"]
+
+    def get(self, s, column):
+        """Get staff detail by staff number."""
+        return self.records[s][column]
+
+    def name(self, s):
+        """Get staff name."""
+        return self.get(s, "Name")
+
+    def email_name(self, s):
+        """Get staff name used in email."""
+        return self.get(s, "Email Name")
+
+    def email(self, s):
+        """Get staff corporate email."""
+        return self.get(s, "Corporate Email")
+
+    def team(self, s):
+        """Get staff team."""
+        return self.get(s, "Team")
+
+    def team_members(self, g):
+        """Get staff numbers of team members."""
+        return self.members.get(g, [])
+
+    def team_admin_emails(self, g):
+        """Get corporate emails of team admins."""
+        return [self.email(s) for s in self.admins[g]]
+
+    def team_admin_email_names(self, g):
+        """Get names used in email of team admins."""
+        return [self.email_name(s) for s in self.admins[g]]
+
+
+# Function to get staff directory
+def get_staff_directory(config):
+    """Get staff directory, reloading it only if staff list has changed."""
+    global staff_directory
+
+    with staff_directory_lock:
+        if staff_directory is None or staff_directory.is_outdated(config):
+            staff_directory = StaffDirectory(config)
+
+        return staff_directory
+
+
+if __name__ == "__main__":
+    # Read configuration file
+    config = read_configuration_file()
+
+    # Load staff directory
+    print("[" + get_timestamp() + "] " +
+          str(len(get_staff_directory(config))) + " staff in staff list.")
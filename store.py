@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""Store qualification, training and practice records in SQLite."""
+
+# Import libraries
+from common import get_timestamp, handle_error_message, \
+    read_configuration_file, read_record_files
+from profiling import profiled
+from staff import get_staff_directory
+import numpy as np
+import pandas as pd
+import glob
+import hashlib
+import os
+import sqlite3
+import threading
+
+# Columns of qualification report
+QUALIFICATION_COLUMNS = [
+    "Staff ID",
+    "Name",
+    "Qualification Code",
+    "Qualification",
+    "First Obtain",
+    "Last Refresh",
+    "Expiry",
+    "Due for Refresh/Examination",
+    "Last Practice/Attachment",
+    "Status",
+    "Note",
+    "Organization Unit",
+    "Organization Unit Desc"
+]
+
+# Columns of training report
+TRAINING_COLUMNS = [
+    "Staff Name",
+    "Staff No",
+    "Course Code",
+    "Course Desc",
+    "Start",
+    "End",
+    "Refresh",
+    "PassFlag",
+    "Organization Unit",
+    "Organization Unit Desc",
+    "Remarks"
+]
+
+# Initialise paths of record stores of which tables are created
+initialised_record_stores = set()
+record_store_lock = threading.Lock()
+
+
+# Function to quote column names for SQL
+def quote_columns(columns):
+    """Quote column names for SQL."""
+    return ", ".join('"' + c + '"' for c in columns)
+
+
+# Function to create tables of record store
+def initialise_record_store(connection):
+    """Create tables and indexes of record store if not exist."""
+    # Create qualification table with date of expiry in sortable format
+    connection.execute(
+            "CREATE TABLE IF NOT EXISTS qualification (" +
+            ", ".join('"' + c + '" TEXT' for c in QUALIFICATION_COLUMNS) +
+            ", expiry_date TEXT, fetch_date TEXT)")
+    connection.execute(
+            "CREATE INDEX IF NOT EXISTS qualification_staff_id "
+            "ON qualification (\"Staff ID\")")
+    connection.execute(
+            "CREATE INDEX IF NOT EXISTS qualification_code "
+            "ON qualification (\"Qualification Code\")")
+    connection.execute(
+            "CREATE INDEX IF NOT EXISTS qualification_expiry_date "
+            "ON qualification (expiry_date)")
+
+    # Create training table
+    connection.execute(
+            "CREATE TABLE IF NOT EXISTS training (staff_id TEXT, " +
+            ", ".join('"' + c + '" TEXT' for c in TRAINING_COLUMNS) +
+            ", fetch_date TEXT)")
+    connection.execute(
+            "CREATE INDEX IF NOT EXISTS training_staff_id "
+            "ON training (staff_id)")
+    connection.execute(
+            "CREATE INDEX IF NOT EXISTS training_course_code "
+            "ON training (\"Course Code\")")
+
+    # Create practice table
+    connection.execute(
+            "CREATE TABLE IF NOT EXISTS practice ("
+            "staff_id TEXT, qualification_code TEXT, since TEXT, "
+            "count TEXT, fetched_at REAL, accessed_at REAL, "
+            "PRIMARY KEY (staff_id, qualification_code, since))")
+    connection.execute(
+            "CREATE INDEX IF NOT EXISTS practice_accessed_at "
+            "ON practice (accessed_at)")
+
+    # Create ledger of alerted failed training records
+    connection.execute(
+            "CREATE TABLE IF NOT EXISTS failed_training ("
+            "staff_no TEXT, course_code TEXT, end TEXT, alert_date TEXT, "
+            "PRIMARY KEY (staff_no, course_code, end))")
+
+    # Create ledger of sent emails
+    connection.execute(
+            "CREATE TABLE IF NOT EXISTS sent_email ("
+            "recipient TEXT, type TEXT, date TEXT, content_hash TEXT, "
+            "sent_at TEXT, "
+            "PRIMARY KEY (recipient, type, date, content_hash))")
+    connection.execute(
+            "CREATE INDEX IF NOT EXISTS sent_email_date "
+            "ON sent_email (date)")
+    connection.commit()
+
+
+# Function to connect to record store
+def connect_record_store(config):
+    """Connect to record store, creating its tables on first connection."""
+    path = config.get("record_store_path", "temp/record.db")
+    connection = sqlite3.connect(path, timeout=30)
+
+    # Create tables only once per record store in this process
+    with record_store_lock:
+        if path not in initialised_record_stores:
+            initialise_record_store(connection)
+            initialised_record_stores.add(path)
+
+    return connection
+
+
+# Function to convert dataframe to rows for SQL
+def to_rows(df):
+    """Convert dataframe to rows with NULL for blank values."""
+    df = df.astype(object)
+
+    return df.where(df.notna() & (df != ""), None).values.tolist()
+
+
+# Function to read rows from SQL to dataframe
+def read_rows(connection, query, parameters=()):
+    """Read rows from SQL to dataframe with NaN for NULL values."""
+    df = pd.read_sql_query(query, connection, params=parameters)
+
+    return df.where(df.notna(), np.nan)
+
+
+# Function to upsert qualification record of a staff
+def upsert_qualification_record(config, staff_id, name, df_record):
+    """Replace qualification record of a staff in one transaction."""
+    # Tag record with staff
+    df = df_record.copy()
+    df.insert(0, "Staff ID", staff_id)
+    df.insert(1, "Name", name)
+    df = df.reindex(columns=QUALIFICATION_COLUMNS)
+
+    # Add expiry or due date in sortable format and fetch date
+    df["expiry_date"] = pd.to_datetime(
+            df["Expiry"].mask(df["Expiry"] == "").combine_first(
+                df["Due for Refresh/Examination"].mask(
+                    df["Due for Refresh/Examination"] == "")),
+            format="%d/%m/%Y", errors="coerce").dt.strftime("%Y-%m-%d")
+    df["fetch_date"] = get_timestamp(format="%Y-%m-%d")
+
+    # Replace previous record of the staff
+    connection = connect_record_store(config)
+    with connection:
+        connection.execute(
+                "DELETE FROM qualification WHERE \"Staff ID\" = ?",
+                (staff_id,))
+        connection.executemany(
+                "INSERT INTO qualification (" +
+                quote_columns(QUALIFICATION_COLUMNS) +
+                ", expiry_date, fetch_date) VALUES (" +
+                ", ".join(["?"] * (len(QUALIFICATION_COLUMNS) + 2)) + ")",
+                to_rows(df))
+    connection.close()
+
+
+# Function to upsert training record of a staff
+def upsert_training_record(config, staff_id, df_record):
+    """Replace training record of a staff in one transaction."""
+    # Refuse record of which columns have changed rather than losing data
+    missing = [c for c in TRAINING_COLUMNS if c not in df_record.columns]
+    unexpected = [str(c) for c in df_record.columns
+                  if c not in TRAINING_COLUMNS]
+    if len(missing) > 0 or len(unexpected) > 0:
+        error = "Training record of " + staff_id + " has missing " + \
+            "column(s) [" + ", ".join(missing) + "] and unexpected " + \
+            "column(s) [" + ", ".join(unexpected) + "]."
+        handle_error_message(error)
+        raise ValueError(error)
+
+    # Tag record with staff and fetch date
+    df = df_record[TRAINING_COLUMNS].copy()
+    df.insert(0, "staff_id", staff_id)
+    df["fetch_date"] = get_timestamp(format="%Y-%m-%d")
+
+    # Replace previous record of the staff
+    connection = connect_record_store(config)
+    with connection:
+        connection.execute(
+                "DELETE FROM training WHERE staff_id = ?", (staff_id,))
+        connection.executemany(
+                "INSERT INTO training (staff_id, " +
+                quote_columns(TRAINING_COLUMNS) + ", fetch_date) VALUES (" +
+                ", ".join(["?"] * (len(TRAINING_COLUMNS) + 2)) + ")",
+                to_rows(df))
+    connection.close()
+
+
+# Function to read qualification records of current staff
+def read_qualification_records(config, staff_numbers):
+    """Read qualification records of current staff."""
+    connection = connect_record_store(config)
+    df = read_rows(
+            connection,
+            "SELECT " + quote_columns(QUALIFICATION_COLUMNS) +
+            " FROM qualification ORDER BY \"Name\", \"Staff ID\", rowid")
+    connection.close()
+
+    # Filter away former staff
+    return df[df["Staff ID"].isin(staff_numbers)].reset_index(drop=True)
+
+
+# Function to read training records of current staff
+def read_training_records(config, staff_numbers):
+    """Read training records of current staff."""
+    connection = connect_record_store(config)
+    df = read_rows(
+            connection,
+            "SELECT staff_id, " + quote_columns(TRAINING_COLUMNS) +
+            " FROM training ORDER BY \"Staff Name\", staff_id, rowid")
+    connection.close()
+
+    # Filter away former staff
+    df = df[df["staff_id"].isin(staff_numbers)]
+
+    return df.drop(columns="staff_id").reset_index(drop=True)
+
+
+# Function to get keys of failed training records
+def get_failed_training_keys(df):
+    """Get (Staff No, Course Code, End) keys of failed training records."""
+    return list(zip(df["Staff No"].astype(str), df["Course Code"].astype(str),
+                    df["End"].astype(str)))
+
+
+# Function to read keys of alerted failed training records
+def read_failed_training_keys(config):
+    """Read keys of all failed training records alerted before."""
+    connection = connect_record_store(config)
+    keys = set(connection.execute(
+            "SELECT staff_no, course_code, end FROM failed_training"))
+    connection.close()
+
+    # Seed ledger with previous failed report if ledger is empty
+    if len(keys) == 0 and os.path.exists("temp/F_Report.csv"):
+        keys = set(get_failed_training_keys(
+            pd.read_csv("temp/F_Report.csv")))
+        append_failed_training_keys(config, keys)
+
+    return keys
+
+
+# Function to append keys of newly alerted failed training records
+def append_failed_training_keys(config, keys):
+    """Append keys of newly alerted failed training records to ledger."""
+    connection = connect_record_store(config)
+    with connection:
+        connection.executemany(
+                "INSERT OR IGNORE INTO failed_training VALUES (?, ?, ?, ?)",
+                [(*key, get_timestamp(format="%Y-%m-%d")) for key in keys])
+    connection.close()
+
+
+# Function to get key of an email
+def get_email_key(recipient, email_type, data):
+    """Get (recipient, type, date, content hash) key of an email."""
+    if isinstance(data, pd.DataFrame):
+        data = data.to_csv(index=False)
+
+    return (recipient, email_type, get_timestamp(format="%Y-%m-%d"),
+            hashlib.sha256(str(data).encode("utf-8")).hexdigest())
+
+
+# Function to read keys of emails sent today
+def read_sent_email_keys(config):
+    """Read keys of all emails sent today."""
+    connection = connect_record_store(config)
+    keys = set(connection.execute(
+            "SELECT recipient, type, date, content_hash FROM sent_email "
+            "WHERE date = ?", (get_timestamp(format="%Y-%m-%d"),)))
+    connection.close()
+
+    return keys
+
+
+# Function to record a sent email
+def record_sent_email(config, key):
+    """Record key of a sent email in ledger."""
+    connection = connect_record_store(config)
+    with connection:
+        connection.execute(
+                "INSERT OR IGNORE INTO sent_email VALUES (?, ?, ?, ?, ?)",
+                (*key, get_timestamp()))
+    connection.close()
+
+
+# Function to remove previous individual record files of a staff
+def remove_record_files(pattern):
+    """Remove previous individual record files matching a pattern."""
+    for previous_file in glob.glob(pattern):
+        os.remove(previous_file)
+
+
+# Function to export individual record files from record store
+def export_record_files(config):
+    """Export individual qualification and training record files."""
+    date = get_timestamp(format="%Y%m%d")
+    connection = connect_record_store(config)
+
+    # Export qualification record of each staff
+    df = read_rows(
+            connection,
+            "SELECT " + quote_columns(QUALIFICATION_COLUMNS) +
+            " FROM qualification ORDER BY rowid")
+    for (sid, name), df_s in df.groupby(["Staff ID", "Name"], sort=False):
+        remove_record_files("temp/Q_*_" + glob.escape(sid) + "_*.csv")
+        df_s.drop(columns=["Staff ID", "Name"]).to_csv(
+                "temp/Q_" + name + "_" + sid + "_" + date + ".csv",
+                index=False, encoding="utf-8-sig")
+
+    # Export training record of each staff
+    df = read_rows(
+            connection,
+            "SELECT staff_id, " + quote_columns(TRAINING_COLUMNS) +
+            " FROM training ORDER BY rowid")
+    for sid, df_s in df.groupby("staff_id", sort=False):
+        remove_record_files("temp/T_*_" + glob.escape(sid) + "_*.csv")
+        df_s.drop(columns="staff_id").to_csv(
+                "temp/T_" + df_s.iloc[0, 1] + "_" + sid + "_" + date +
+                ".csv", index=False, encoding="utf_8_sig")
+
+    connection.close()
+
+
+# Function to import individual record files into record store
+def import_record_files(config):
+    """Import existing individual record files into record store."""
+    # Read staff list
+    staff_numbers = set(get_staff_directory(config).staff_numbers)
+
+    # Import qualification record files
+    for key, df in read_record_files(
+            "temp/Q_*.csv", staff_numbers,
+            lambda f, key: (key, pd.read_csv(f, dtype="string")),
+            config.get("report_workers", 8), combine=False):
+        upsert_qualification_record(config, key[2], key[1], df)
+
+    # Import training record files
+    for key, df in read_record_files(
+            "temp/T_*.csv", staff_numbers,
+            lambda f, key: (key, pd.read_csv(f, dtype="string")),
+            config.get("report_workers", 8), combine=False):
+        upsert_training_record(config, key[2], df)
+
+
+if __name__ == "__main__":
+    # Read configuration file
+    config = read_configuration_file()
+
+    # Run under profilers if --profile option is given
+    with profiled(config, "store"):
+        # Import existing individual record files
+        import_record_files(config)
+
+    print("[" + get_timestamp() + "] Imported record files into " +
+          "record store.")
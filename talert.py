@@ -3,31 +3,33 @@
 
 # Import libraries
 from common import get_timestamp, read_configuration_file
+from mail import build_message, close_mail_transport, get_mail_transport
+from outbox import drain_outbox, enqueue_message, read_pending_email_keys
+from profiling import profiled
+from render import render_table, render_template
+from store import append_failed_training_keys, get_email_key, \
+    get_failed_training_keys
 from treport import check_failed_training_records
-import pandas as pd
-import win32com.client
-import os
 
 
 # Function for sending alert email for failed training
 def send_failed_training_alert_email(config, df, display=False):
     """Send alert email for failed training."""
+    # Get keys of emails sent today or waiting in outbox
+    pending = read_pending_email_keys(config)
+
     # Iterate through each failed case
     for i, r in df.iterrows():
-        # Load alert email template
-        with open("template/t_reminder_failed.html", "r") as file:
-            content = file.read()
-
-        # Replace sender's details placeholders in email
-        for key, value in config["email_sender"].items():
-            try:
-                content = content.replace("{{ " + key + " }}", value)
-
-            except BaseException:
-                pass
-
-        # Replace placeholders in email content
-        content = content.replace("{{ staff_name }}", r["Staff Name"])
+        # Skip email of failed case which has been sent today
+        key = get_email_key(config["email_sender"]["admin_email"],
+                            "t_reminder_failed", df.loc[[i]])
+        if not display and key in pending:
+            print('[' + get_timestamp() +
+                  "] Skipped failed training alert email (" +
+                  r["Staff Name"] + ") as it has been sent today.")
+            append_failed_training_keys(
+                    config, get_failed_training_keys(df.loc[[i]]))
+            continue
 
         # Filter the dataframe by staff name
         df_t = df[df["Staff Name"] == r["Staff Name"]].copy()
@@ -39,37 +41,15 @@ def send_failed_training_alert_email(config, df, display=False):
                    ], axis=1, inplace=True)
 
         # Convert dataframe to HTML table
-        email_table = df_t.to_html(
-            index=False, justify="center").replace(
-                    '<td', '<td align="center"').replace(
-                            '<table',
-                            '<table border="1" class="dataframe"' +
-                            'style="font-family: Courier New" cellpadding=24')
-
-        email_table = email_table.replace(
-                'Course Desc', 'Course Description')
-        email_table = email_table.replace(
-                'Start', 'Start Date')
-        email_table = email_table.replace(
-                'End', 'End Date')
-
-        # Replace reminder table in email
-        content = content.replace("{{ email_table }}", email_table)
-
-        # Open Outlook application
-        outlook = win32com.client.Dispatch('outlook.application')
-
-        # Create new email
-        mail = outlook.CreateItem(0)
-
-        # Insert corporate logo in email
-        attachment = mail.Attachments.Add(
-                os.path.abspath(config["email_sender"]["corp_logo"]))
-        attachment.PropertyAccessor.SetProperty(
-                "http://schemas.microsoft.com/mapi/proptag/0x3712001F", "logo")
-
-        # Receiver's email
-        mail.To = config["email_sender"]["admin_email"]
+        email_table = render_table(
+                df_t, headers={"Course Desc": "Course Description",
+                               "Start": "Start Date", "End": "End Date"},
+                na_rep="NaN")
+
+        # Render alert email template
+        content = render_template(config, "t_reminder_failed",
+                                  email_table=email_table,
+                                  staff_name=r["Staff Name"])
 
         # Send email copy
         cc_list = []
@@ -78,37 +58,42 @@ def send_failed_training_alert_email(config, df, display=False):
         for cc_exp in config["email_cc_expiry"]:
             cc_list.append(cc_exp)
 
-        # Set CC
-        mail.CC = "; ".join(cc_list)
-
-        # Email subject
-        mail.Subject = "Failed Training Assessment Alert on " + \
-            get_timestamp(format="%d/%m/%Y")
-
-        # Email body content in HTML
-        mail.HTMLBody = content
+        # Email to admin with subject
+        message = build_message(
+                [config["email_sender"]["admin_email"]], cc_list,
+                "Failed Training Assessment Alert on " +
+                get_timestamp(format="%d/%m/%Y"), content)
 
         # Display email for checking
         if display:
-            mail.Display()
+            get_mail_transport(config).send(message, display=True)
 
-        # Send email
+        # Queue email in outbox
         else:
-            mail.Send()
-            # Print confirmation on console
-            print('[' + get_timestamp() +
-                  "] Sent failed training alert email (" +
-                  r["Staff Name"] +
-                  ") to admin.")
+            enqueue_message(config, message,
+                            "failed training alert email (" +
+                            r["Staff Name"] + ") to admin", key)
+            pending.add(key)
+
+            # Append key of failed record to ledger once alert is queued
+            append_failed_training_keys(
+                    config, get_failed_training_keys(df.loc[[i]]))
+
+    # Send queued emails
+    if not display:
+        drain_outbox(config)
 
 
 if __name__ == '__main__':
     # Read configuration file
     config = read_configuration_file()
 
-    # Check failed training records
-    df_failed = check_failed_training_records(config, test_date=None)
-    print(df_failed)
+    # Run under profilers if --profile option is given
+    with profiled(config, "talert"):
+        # Check failed training records
+        df_failed = check_failed_training_records(config, test_date=None)
+        print(df_failed)
 
-    # Send alert email
-    send_failed_training_alert_email(config, df_failed, display=True)
+        # Send alert email
+        send_failed_training_alert_email(config, df_failed, display=True)
+    close_mail_transport()
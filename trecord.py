@@ -2,8 +2,13 @@
 """Fetch training record."""
 
 # Import libraries
-from common import get_timestamp, get_time_difference, read_configuration_file
-from datetime import datetime
+from common import get_timestamp, read_configuration_file, run_worker_pool
+from io import BytesIO
+from metrics import increment, timed
+from profiling import profiled
+from staff import get_staff_directory
+from store import upsert_training_record
+from portal import open_portal_session, request_training_download
 from selenium import webdriver
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
@@ -11,141 +16,222 @@ from selenium.webdriver.common.by import By
 import pandas as pd
 import glob
 import os
+import shutil
+import tempfile
 import time
 
+# Import Windows directory change notification if available
+try:
+    import win32con
+    import win32event
+    import win32file
+except ImportError:
+    win32file = None
 
-# Function to fetch training record
-def fetch_training_record(config):
-    """Fetch training record."""
-    # Read staff list
-    df = pd.read_csv(config['staff_list_path'], dtype="string")
 
-    # Initialise webdriver
+# Function to initialise webdriver with its own download folder
+def initialise_download_webdriver():
+    """Initialise headless webdriver with an isolated download folder."""
+    # Create download folder for this session only
+    download_path = os.path.abspath(tempfile.mkdtemp(
+        prefix="download_", dir="temp"))
+
+    # Download files to the folder without prompting
     options = webdriver.ChromeOptions()
     options.add_argument("--headless=new")
-    web = webdriver.Chrome(options=options)
+    options.add_experimental_option("prefs", {
+        "download.default_directory": download_path,
+        "download.prompt_for_download": False,
+        "download.directory_upgrade": True})
 
-    # Get user path
-    user_path = "C:\\Users\\" + os.getlogin()
+    return webdriver.Chrome(options=options), download_path
 
-    # Initialise an array to store all failed cases
-    failed = []
 
-    print("[" + get_timestamp() + "] Fetching staff training record...")
+# Function to quit webdriver and remove its download folder
+def quit_download_webdriver(client):
+    """Quit webdriver and remove its download folder."""
+    web, download_path = client
+    web.quit()
+    shutil.rmtree(download_path, ignore_errors=True)
+
 
-    # Iterate through all staff
-    for d, s in enumerate(df["Staff Number"]):
-        try:
-            staff_id = s
+# Function to wait for a training record file to be downloaded
+def wait_for_download(download_path, timeout):
+    """Wait for training record file by directory change notification."""
+    deadline = time.monotonic() + timeout
 
-            # Remove all training record files in Downloads folder
-            file_list = glob.glob(user_path + "\\Downloads\\TrainResult*")
+    # Watch file name changes, as Chrome renames the file when completed
+    handle = None
+    if win32file is not None:
+        handle = win32file.FindFirstChangeNotification(
+                download_path, False, win32con.FILE_NOTIFY_CHANGE_FILE_NAME)
 
+    try:
+        while True:
+            # Check if the file exists
+            file_list = glob.glob(os.path.join(download_path,
+                                               "TrainResult*.xls"))
             if len(file_list) > 0:
-                for file in file_list:
-                    os.remove(file)
+                return file_list[0]
 
-            # Browse webpage
-            web.get(config["enquiry_training_link"])
+            # Stop waiting if timeout is reached
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
 
-            # Find input field for staff number
-            staff_id_input = WebDriverWait(web, 10).until(
-                    EC.presence_of_element_located((
-                        By.XPATH,
-                        '//*[@id="ctl00_cphContent_txtTrainingStaffNo_' +
-                        'txtStaffNo"]')))
+            # Wait for next change in download folder
+            if handle is not None:
+                if win32event.WaitForSingleObject(
+                        handle, int(remaining * 1000)
+                ) == win32event.WAIT_OBJECT_0:
+                    win32file.FindNextChangeNotification(handle)
 
-            # Fill in staff number
-            staff_id_input.send_keys(staff_id)
+            # Check again shortly without change notification
+            else:
+                time.sleep(min(0.2, remaining))
 
-            # Find "Data Download" button
-            download_button = WebDriverWait(web, 10).until(
-                    EC.presence_of_element_located((
-                        By.XPATH,
-                        '//*[@id="ctl00_cphContent_btnDown"]')))
+    finally:
+        if handle is not None:
+            win32file.FindCloseChangeNotification(handle)
 
-            # Click "Data Download" button
-            download_button.click()
 
-            # Record download start time and initialise end time
-            start_time = datetime.now()
-            end_time = datetime.now()
+# Function to download training record file of a staff
+def download_training_file(config, client, staff_id):
+    """Download training record file of a staff with webdriver."""
+    web, download_path = client
+
+    # Remove all training record files in download folder
+    for file in glob.glob(os.path.join(download_path, "TrainResult*")):
+        os.remove(file)
+
+    # Browse webpage
+    web.get(config["enquiry_training_link"])
+
+    # Find input field for staff number
+    staff_id_input = WebDriverWait(web, 10).until(
+            EC.presence_of_element_located((
+                By.XPATH,
+                '//*[@id="ctl00_cphContent_txtTrainingStaffNo_' +
+                'txtStaffNo"]')))
+
+    # Fill in staff number
+    staff_id_input.send_keys(staff_id)
+
+    # Find "Data Download" button
+    download_button = WebDriverWait(web, 10).until(
+            EC.presence_of_element_located((
+                By.XPATH,
+                '//*[@id="ctl00_cphContent_btnDown"]')))
+
+    # Click "Data Download" button
+    download_button.click()
+
+    # Wait for the file to be downloaded
+    return wait_for_download(download_path, 180)
+
+
+# Function to request training record file of a staff into memory
+def request_training_file(config, session, staff_id):
+    """Request training record file of a staff without a browser."""
+    return BytesIO(request_training_download(config, session, staff_id))
+
+
+# Function to parse training record file
+def parse_training_record(file):
+    """Parse training record file from path or buffer."""
+    # Read the file
+    df_record_s = pd.read_excel(file, skiprows=7)
+
+    # Drop blank columns
+    return df_record_s.drop(columns=[df_record_s.columns[5],
+                                     df_record_s.columns[11]])
 
-            # Check if the file exists
-            download_flag = False
-            while get_time_difference(start_time, end_time) < 180:
-                file_list = glob.glob(user_path +
-                                      "\\Downloads\\TrainResult*.xls")
-                if len(file_list) > 0:
-                    download_flag = True
-                    break
-
-                time.sleep(5)
-                end_time = datetime.now()
-
-            # Continue iteration if file download is unsuccessful
-            if not download_flag:
-                print("[" + get_timestamp() +
-                      "] Failed to download training record for " +
-                      df[df["Staff Number"] == s]["Name"].values[0] + '.')
-                failed.append(s)
-                continue
-
-            # Read the downloaded file
-            df_record_s = pd.read_excel(file_list[0], skiprows=7)
-
-            # Drop blank columns
-            df_record_s = df_record_s.drop(columns=[df_record_s.columns[5],
-                                                    df_record_s.columns[11]])
-
-            # Get staff name
-            name = df_record_s.iloc[0, 0]
-
-            # Remove previous files
-            try:
-                for previous_file in glob.glob("temp/T_" + name + "*"):
-                    os.remove(previous_file)
-            except BaseException:
-                pass
-
-            # Save dataframe as CSV file
-            file_name = "temp/T_" + name + "_" + staff_id + "_" + \
-                get_timestamp(format="%Y%m%d") + ".csv"
-            df_record_s.to_csv(file_name, index=False, encoding="utf_8_sig")
-
-            # Go to previous page
-            web.back()
-
-            # Find input field for staff number
-            staff_id_input = WebDriverWait(web, 10).until(
-                    EC.presence_of_element_located((
-                        By.XPATH,
-                        '//*[@id="ctl00_cphContent_txtTrainingStaffNo_' +
-                        'txtStaffNo"]')))
-
-            # Clear previous search
-            staff_id_input.clear()
-
-        except BaseException:
-            # Append staff number to failed array
-            failed.append(s)
 
+# Function to fetch training record of a staff
+@timed("tqm_staff_fetch_seconds", record="training")
+def fetch_staff_training_record(config, client, staff, s, fetch_file):
+    """Fetch training record of a staff."""
+    try:
+        staff_id = s
+
+        # Get training record file with the given engine
+        file = fetch_file(config, client, staff_id)
+
+        # Return failure if file download is unsuccessful
+        if file is None:
             print("[" + get_timestamp() +
-                  "] Failed to fetch training record for " +
-                  df[df["Staff Number"] == s]["Name"].values[0] + '.')
+                  "] Failed to download training record for " +
+                  staff.name(s) + '.')
+            increment("tqm_staff_fetch_failures_total", record="training")
+            return False
 
-            # Go to original page
-            web.get(config["enquiry_training_link"])
+        # Read the file
+        df_record_s = parse_training_record(file)
 
-    # Quit web
-    web.quit()
+        # Replace training record of the staff in record store
+        upsert_training_record(config, staff_id, df_record_s)
+
+        return True
+
+    except BaseException:
+        print("[" + get_timestamp() +
+              "] Failed to fetch training record for " +
+              staff.name(s) + '.')
+        increment("tqm_staff_fetch_failures_total", record="training")
+
+        return False
+
+
+# Function to fetch training records with a pool of clients
+def fetch_training_record_with_engine(config, staff, staff_list, engine):
+    """Fetch training records with the given engine."""
+    # Split the staff list between a pool of HTTP sessions
+    if engine == "http":
+        return run_worker_pool(
+                staff_list, config.get("fetch_workers", 1),
+                lambda: open_portal_session(config),
+                lambda session, s: fetch_staff_training_record(
+                    config, session, staff, s, request_training_file),
+                lambda session: session.close())
+
+    # Split the staff list between a pool of webdrivers
+    return run_worker_pool(
+            staff_list, config.get("fetch_workers", 1),
+            initialise_download_webdriver,
+            lambda client, s: fetch_staff_training_record(
+                config, client, staff, s, download_training_file),
+            quit_download_webdriver)
+
+
+# Function to fetch training record
+def fetch_training_record(config):
+    """Fetch training record."""
+    # Read staff list
+    staff = get_staff_directory(config)
+    staff_list = staff.staff_numbers
+
+    # Get fetch engine
+    engine = config.get("fetch_engine", "selenium")
+
+    print("[" + get_timestamp() + "] Fetching staff training record...")
+
+    # Fetch training records
+    results = fetch_training_record_with_engine(
+            config, staff, staff_list, engine)
+
+    # Fall back to webdriver for failed cases of HTTP engine
+    if engine == "http" and not all(results):
+        retry_list = [s for s, r in zip(staff_list, results) if not r]
+
+        print("[" + get_timestamp() + "] Retrying " +
+              str(len(retry_list)) + " failed case(s) with webdriver...")
 
-    # Remove all training record files in Downloads folder
-    file_list = glob.glob(user_path + "\\Downloads\\TrainResult*")
+        retry_results = iter(fetch_training_record_with_engine(
+                config, staff, retry_list, "selenium"))
+        results = [r or next(retry_results) for r in results]
 
-    if len(file_list) > 0:
-        for file in file_list:
-            os.remove(file)
+    # Initialise an array to store all failed cases in staff list order
+    failed = [s for s, r in zip(staff_list, results) if not r]
 
     print("[" + get_timestamp() +
           "] Completed with " + str(len(failed)) + " failed case(s).")
@@ -158,5 +244,7 @@ if __name__ == "__main__":
     # Read configuration file
     config = read_configuration_file()
 
-    # Fetch training record
-    fetch_training_record(config)
+    # Run under profilers if --profile option is given
+    with profiled(config, "trecord"):
+        # Fetch training record
+        fetch_training_record(config)
@@ -3,70 +3,32 @@
 
 # Import libraries
 from common import get_timestamp, read_configuration_file
+from mail import build_message, close_mail_transport, get_mail_transport
+from outbox import drain_outbox, enqueue_message, read_pending_email_keys
+from render import render_table, render_template
+from profiling import profiled
+from staff import get_staff_directory
+from store import get_email_key
 from treport import check_passed_training_records
-import win32com.client
-import pandas as pd
-import os
 
 
 # Function for building training reminder content
 def build_training_reminder_content(config, df):
-    """Process email content for training reminder."""
-    # Load reminder email template
-    with open("template/t_reminder_passed.html", "r") as file:
-        reminder_html = file.read()
-
+    """Process email table for training reminder."""
     # Drop uneccessary columns
     df.drop(["Staff Name", "Staff No", "Course Code", "Start", "End",
              "Refresh", "PassFlag", "Organization Unit",
              "Organization Unit Desc", "Remarks", "Expiry_d", "Expiry", "End_d"
              ], axis=1, inplace=True)
 
-    # Change remaining days column to red in colour
-    df = df.style.set_properties(
-            **{"color": "red"}, subset=["Days Remaining"]).hide(
-                    axis='index')
-
-    # Convert dataframe to HTML table
-    email_table = df.to_html(
-            index=False, justify="center").replace(
-                    '<td', '<td align="center"').replace(
-                            '<table',
-                            '<table border="1" class="dataframe"' +
-                            'style="font-family: Courier New" cellpadding=24')
-
-    email_table = email_table.replace(
-            'Job Attachment Required', 'Job Attachment<br>Required')
-    email_table = email_table.replace(
-            'Course Desc', 'Course Description')
-
-    # Open Outlook application
-    outlook = win32com.client.Dispatch('outlook.application')
-
-    # Create new email
-    mail = outlook.CreateItem(0)
-
-    # Insert corporate logo in email
-    attachment = mail.Attachments.Add(
-            os.path.abspath(config["email_sender"]["corp_logo"]))
-    attachment.PropertyAccessor.SetProperty(
-            "http://schemas.microsoft.com/mapi/proptag/0x3712001F", "logo")
+    # Convert dataframe to HTML table with remaining days red in colour
+    email_table = render_table(
+            df,
+            headers={"Job Attachment Required": "Job Attachment<br>Required",
+                     "Course Desc": "Course Description"},
+            styles={"Days Remaining": lambda v: True})
 
-    # Compose email body content
-    content = reminder_html
-
-    # Replace reminder table in email
-    content = content.replace("{{ email_table }}", email_table)
-
-    # Replace sender's details placeholders in email
-    for key, value in config["email_sender"].items():
-        try:
-            content = content.replace("{{ " + key + " }}", value)
-
-        except BaseException:
-            pass
-
-    return mail, content
+    return email_table
 
 
 # Function for sending training reminder email to staff
@@ -80,8 +42,11 @@ def send_training_reminder_email(config, display=False, test_date=None):
               "] No staff requires training reminder email.")
         return
 
-    # Read staff list
-    df_staff = pd.read_csv(config["staff_list_path"], dtype="string")
+    # Get staff directory
+    staff = get_staff_directory(config)
+
+    # Get keys of emails sent today or waiting in outbox
+    pending = read_pending_email_keys(config)
 
     # Get list of all staff recieving the email
     staff_list = df_passed["Staff No"].unique()
@@ -90,20 +55,28 @@ def send_training_reminder_email(config, display=False, test_date=None):
         # Filter by staff ID
         df_email_pass = df_passed[df_passed["Staff No"] == s]
 
+        # Receiver's email
+        receipient_email = staff.email(str(s))
+
+        # Skip email which has been sent today
+        key = get_email_key(receipient_email, "t_reminder_passed",
+                            df_email_pass)
+        if not display and key in pending:
+            print('[' + get_timestamp() +
+                  "] Skipped training reminder email to " +
+                  staff.name(str(s)) + " as it has been sent today.")
+            continue
+
         # Build reminder content
-        mail, content = build_training_reminder_content(config, df_email_pass)
+        email_table = build_training_reminder_content(config, df_email_pass)
 
         # Get staff name for email
-        staff_email_name = df_staff.loc[
-                df_staff["Staff Number"] == str(s), "Email Name"].item()
-
-        # Replace staff name placeholder in email
-        content = content.replace("{{ staff_name }}", staff_email_name)
+        staff_email_name = staff.email_name(str(s))
 
-        # Receiver's email
-        receipient_email = df_staff.loc[
-            df_staff["Staff Number"] == str(s), "Corporate Email"].item()
-        mail.To = receipient_email
+        # Render reminder email template
+        content = render_template(config, "t_reminder_passed",
+                                  email_table=email_table,
+                                  staff_name=staff_email_name)
 
         # Send email copy
         cc_list = []
@@ -112,9 +85,7 @@ def send_training_reminder_email(config, display=False, test_date=None):
 
         # Get team admin list if any qualification is expiring within 30 days
         if (df_email_pass["Days Remaining"] <= 30).any():
-            g = df_staff.loc[df_staff["Staff Number"] == str(s), "Team"].item()
-            team_admin_list = df_staff.loc[df_staff["Staff Number"].isin(
-                config["team_admin"][g])]["Corporate Email"].tolist()
+            team_admin_list = staff.team_admin_emails(staff.team(str(s)))
 
             # Remove admin email from team admin list
             if config["email_sender"]["admin_email"] in team_admin_list:
@@ -136,40 +107,40 @@ def send_training_reminder_email(config, display=False, test_date=None):
         if receipient_email in cc_list:
             cc_list.remove(receipient_email)
 
-        # Set CC
-        mail.CC = "; ".join(cc_list)
-
-        # Email subject
-        mail.Subject = "Reminder to Complete Job Attachement and/or " + \
-                "Oral Examination on " + get_timestamp(format="%d/%m/%Y")
-
-        # Email body content in HTML
-        mail.HTMLBody = content
+        # Email with subject
+        message = build_message(
+                [receipient_email], cc_list,
+                "Reminder to Complete Job Attachement and/or " +
+                "Oral Examination on " + get_timestamp(format="%d/%m/%Y"),
+                content)
 
         # Display email for inspection
         if display:
-            mail.Display()
+            get_mail_transport(config).send(message, display=True)
 
             # Print confirmation on console
             print('[' + get_timestamp() +
                   "] Prepared training reminder email sending to " +
-                  df_staff.loc[df_staff["Staff Number"] == str(s),
-                               "Name"].item() + '.')
+                  staff.name(str(s)) + '.')
 
-        # Send email
+        # Queue email in outbox
         else:
-            mail.Send()
+            enqueue_message(config, message,
+                            "training reminder email to " +
+                            staff.name(str(s)), key)
+            pending.add(key)
 
-            # Print confirmation on console
-            print('[' + get_timestamp() +
-                  "] Sent training reminder email to " +
-                  df_staff.loc[df_staff["Staff Number"] == str(s),
-                               "Name"].item() + '.')
+    # Send queued emails
+    if not display:
+        drain_outbox(config)
 
 
 if __name__ == "__main__":
     # Read configuration file
     config = read_configuration_file()
 
-    # Send training reminder email to staff
-    send_training_reminder_email(config, display=True, test_date=None)
+    # Run under profilers if --profile option is given
+    with profiled(config, "treminder"):
+        # Send training reminder email to staff
+        send_training_reminder_email(config, display=True, test_date=None)
+    close_mail_transport()
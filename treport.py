@@ -3,35 +3,25 @@
 
 # Import libraries
 from common import get_timestamp, read_configuration_file
+from metrics import timed
+from profiling import profiled
+from staff import get_staff_directory
+from store import get_failed_training_keys, read_failed_training_keys, \
+    read_training_records
 import pandas as pd
 import numpy as np
-import glob
 
 # Configure Pandas
 pd.set_option('mode.chained_assignment', None)
 
 
 # Function for generating report in CSV format
+@timed("tqm_report_build_seconds", report="training")
 def generate_training_report(config):
     """Generate report in CSV format."""
-    # Initialise dataframe for all data
-    df_all = pd.DataFrame([])
-
-    # Read staff list
-    df_staff = pd.read_csv(config["staff_list_path"], dtype="string")
-
-    # Read individual reports
-    files = glob.glob("temp/T_*.csv")
-    for f in files:
-        # Filter away former staff
-        sid = f.split('\\')[1].split("_")[2]
-        if sid not in df_staff["Staff Number"].values:
-            continue
-
-        df = pd.read_csv(f)
-
-        # Append data to main dataframe
-        df_all = pd.concat([df_all, df], ignore_index=True)
+    # Read training records of current staff from record store
+    df_all = read_training_records(
+            config, get_staff_directory(config).staff_numbers)
 
     # Export report as CSV file in local folder
     df_all.to_csv(config["t_report_path"], index=False, encoding="utf_8_sig")
@@ -52,6 +42,7 @@ def generate_training_report(config):
 
 
 # Function for checking passed training records
+@timed("tqm_analysis_seconds", analysis="passed_training")
 def check_passed_training_records(config, test_date=None):
     """Check passed training records."""
     # Get date for testing
@@ -61,62 +52,53 @@ def check_passed_training_records(config, test_date=None):
     else:
         today = np.datetime64("today", 'D')
 
-    # Initialise dataframe for reminder
-    df_p = pd.DataFrame([])
-
     # Read report
     df = pd.read_csv(config["t_report_path"])
     df_q = pd.read_csv(config["q_report_path"])
 
     # Filter records which require job attachment
-    for course in config["has_attachment"].keys():
-        df_c = df[df["Course Code"] == course]
+    df_c = df.merge(config.attachment_table, on="Course Code")
 
-        # Change data type of course end dates
-        df_c["End_d"] = pd.to_datetime(df_c["End"], format="%d/%m/%Y")
+    # Change data type of course end dates
+    df_c["End_d"] = pd.to_datetime(df_c["End"], format="%d/%m/%Y")
 
-        # Calculate expiry dates
-        df_c["Expiry_d"] = df_c["End_d"] + pd.Timedelta(
-                days=config["has_attachment"][course][2])
+    # Calculate expiry dates
+    df_c["Expiry_d"] = df_c["End_d"] + pd.to_timedelta(
+            df_c["att_days"], unit="D")
 
-        # Change data type of expiry dates to string format
-        df_c["Expiry"] = df_c["Expiry_d"].dt.strftime("%d/%m/%Y")
+    # Change data type of expiry dates to string format
+    df_c["Expiry"] = df_c["Expiry_d"].dt.strftime("%d/%m/%Y")
 
-        # Insert number of job attachment required
-        df_c["Job Attachment Required"] = config["has_attachment"][course][1]
+    # Calculate days to expiry
+    df_c["Days Remaining"] = (df_c["Expiry_d"] - today).dt.days
 
-        # Calculate days to expiry
-        df_c["Days Remaining"] = df_c["Expiry_d"] - today
+    # Filter passed records based on reminder days
+    df_cp = df_c[df_c["PassFlag"] == "Passed"].merge(
+            config.attachment_days_table, on=["Course Code", "Days Remaining"])
 
-        # Change data type of days remaining to integer
-        df_c["Days Remaining"] = df_c["Days Remaining"].dt.days
+    # Drop records of which qualification is attained by anti-join
+    df_cp = df_cp.merge(
+            df_q[["Staff ID", "Qualification Code"]].drop_duplicates(
+                ).rename(columns={"Staff ID": "Staff No",
+                                  "Qualification Code": "att_q"}),
+            on=["Staff No", "att_q"], how="left", indicator=True)
+    df_cp = df_cp[df_cp["_merge"] == "left_only"]
 
-        # Sort dataframe by days remaining
-        df_c.sort_values(by="Days Remaining", ascending=False, inplace=True,
-                         ignore_index=True)
+    # Sort records by course and days remaining
+    df_cp = df_cp.sort_values(
+            ["att_order", "Days Remaining"], ascending=[True, False],
+            kind="stable")
 
-        # Filter passed records based on reminder days
-        df_cp = df_c[(df_c["Days Remaining"].isin(config[
-            "has_attachment"][course][-1])) & (df_c["PassFlag"] == "Passed")]
-
-        # Iterate through records to check if qualification is attained
-        for i, r in df_cp.iterrows():
-            if df_q[(df_q["Staff ID"] == r["Staff No"]) & (
-                df_q["Qualification Code"] == config[
-                    "has_attachment"][course][0])].empty is False:
-                # Drop the record if qualification is attained
-                df_cp.drop(i, inplace=True)
-
-            else:
-                pass
-
-        # Append records to passed dataframe
-        df_p = pd.concat([df_p, df_cp], ignore_index=True)
+    # Keep columns of training report and calculated columns
+    df_p = df_cp[list(df.columns) + [
+        "End_d", "Expiry_d", "Expiry", "Job Attachment Required",
+        "Days Remaining"]].reset_index(drop=True)
 
     return df_p
 
 
 # Function for checking failed training records
+@timed("tqm_analysis_seconds", analysis="failed_training")
 def check_failed_training_records(config, test_date=None):
     """Check failed training records."""
     # Get date for testing
@@ -150,28 +132,11 @@ def check_failed_training_records(config, test_date=None):
 
         # Filter failed records based on days passed since course end
         df_f = df_f[df_f["Days Passed"] <= 365]
-        df_fo = df_f.copy()
-
-        # Compare with past report
-        if df_f.empty is False:
-            try:
-                df_fp = pd.read_csv("temp/F_Report.csv")
-
-                for i, r in df_fo.iterrows():
-                    if df_fp[(df_fp["Staff No"] == r["Staff No"]) & (
-                        df_fp["Course Code"] == r["Course Code"]) & (
-                            df_fp["End"] == r["End"])].empty is False:
-                        # Drop the record if it is already in past report
-                        df_fo.drop(i, inplace=True)
-
-            except BaseException:
-                pass
 
-            finally:
-                # Export failed records as CSV file in temp folder
-                df_f.drop(columns=["End_d", "Days Passed"], inplace=True)
-                df_f.to_csv(
-                        "temp/F_Report.csv", index=False, encoding="utf_8_sig")
+        # Find new failed records by set difference with ledger
+        alerted = read_failed_training_keys(config)
+        keys = get_failed_training_keys(df_f)
+        df_fo = df_f[np.array([k not in alerted for k in keys], dtype=bool)]
 
     return df_fo
 
@@ -180,13 +145,15 @@ if __name__ == "__main__":
     # Read configuration file
     config = read_configuration_file()
 
-    # Generate report
-    generate_training_report(config)
+    # Run under profilers if --profile option is given
+    with profiled(config, "treport"):
+        # Generate report
+        generate_training_report(config)
 
-    # Check passed training records
-    df_passed = check_passed_training_records(config, test_date=None)
-    print(df_passed)
+        # Check passed training records
+        df_passed = check_passed_training_records(config, test_date=None)
+        print(df_passed)
 
-    # Check failed training records
-    df_failed = check_failed_training_records(config, test_date=None)
-    print(df_failed)
+        # Check failed training records
+        df_failed = check_failed_training_records(config, test_date=None)
+        print(df_failed)